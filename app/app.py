@@ -1,13 +1,29 @@
-from flask import Flask, request, jsonify, send_from_directory
-from sys import argv
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, abort
+from argparse import ArgumentParser
+import atexit
 from pathlib import Path
+import os
+import json
+import time
+import zlib
 from backend import library as usr_lib
+from backend import metrics
+try:
+    from waitress import serve as waitress_serve            # (optional) the production WSGI server, which is needed for `--serve` (`pip install waitress`)
+except ImportError:
+    waitress_serve = None
 
 ######### Data #########
 
 APP_DIR = Path(__file__).parent                             # the path of the application directory 
     # (gotten from this script, which should ALWAYS be in the top level of the project dir)
 
+SERVER_ID = os.urandom(4).hex()                             # a random ID for this run of the server, included in ETags and change cursors (as library generations start again from 0 every run)
+
+CHANGE_STREAM_TIMEOUT = 15                                  # the number of seconds that the change stream waits for changes before checking the library directory for outside changes (and sending a keep-alive)
+CHANGE_STREAM_MAX_SECONDS = 300                             # the number of seconds after which the change stream ends (each open stream holds a server thread, so the client reconnects to continue it instead of holding one forever)
+CHANGE_STREAM_RETRY_MS = 1000                               # the number of milliseconds that the client's EventSource waits before reconnecting once the change stream ends
+
 
 ######### Main Flask Server Code #########
 
@@ -19,8 +35,79 @@ app = Flask(__name__)
 def get_main_page():
     return send_from_directory(app.static_folder, "index.html")
 
+###### Request Timing ######
+
+@app.before_request
+def start_request_timing():
+    metrics.start_request()
+
+@app.after_request
+def finish_request_timing(response):
+    endpoint = request.url_rule.rule if request.url_rule else "(unknown)"   # (timed by route, so that unknown paths don't each get their own metrics)
+    metrics.finish_request(endpoint, response.status_code)
+    return response
+
+###### Endpoint Support ######
+
+def get_conditional_json_response(get_result):
+    """Get a JSON response for the library data returned by `get_result()` (a function with 
+    no arguments), with an ETag made from the library's generation and the request data. If 
+    the request's `If-None-Match` header has the same ETag, then the result hasn't changed 
+    since the client last got it, so a `304 Not Modified` response (without a body) is 
+    returned instead of serializing and sending the result again. If the library is being 
+    watched, then its current generation is already known, so the ETag is checked before 
+    getting the result, which is then only gotten if the client's copy is out of date."""
+    lib_path = app.config['LIB_PATH']
+    request_hash = f"{zlib.crc32(request.get_data()):08x}"
+    generation = usr_lib.get_synced_generation(lib_path)
+    if generation is not None:
+        etag = f"{SERVER_ID}-{generation}-{request_hash}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)       # (the client's copy is current, so the result doesn't need to be gotten at all)
+            response.set_etag(etag)
+            return response
+    generation = usr_lib.get_generation(lib_path)
+    result = get_result()
+    if usr_lib.get_generation(lib_path) != generation:
+        with metrics.span("json"):
+            return jsonify(result)                          # (the library changed while getting the result, so it can't be tagged with either generation)
+    etag = f"{SERVER_ID}-{generation}-{request_hash}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        with metrics.span("json"):
+            response = jsonify(result)
+    response.set_etag(etag)
+    return response
+
+def get_library_changes(cursor:str, wait:bool=False, timeout:float=None) -> dict:
+    """Get the changes to the library since a change cursor (see `/lib/changes`), optionally 
+    waiting for them. If the cursor is missing or from another run of the server, then the 
+    `changes` will be None."""
+    lib_path = app.config['LIB_PATH']
+    server_id, _, generation = (cursor or "").partition('-')
+    if server_id != SERVER_ID or not generation.isdigit():
+        changes = usr_lib.get_changes(lib_path, None)
+    elif wait:
+        changes = usr_lib.wait_for_changes(lib_path, int(generation), timeout)
+    else:
+        changes = usr_lib.get_changes(lib_path, int(generation))
+    changes['cursor'] = f"{SERVER_ID}-{changes.pop('generation')}"
+    return changes
+
 ###### Endpoint Functions ######
 
+@app.route('/metrics', methods = ['GET'])
+def get_metrics():
+    """Get the request and library timing metrics, in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/metrics/slowest', methods = ['GET'])
+def get_slowest_requests():
+    """Get the slowest requests with the time spent in each phase (only if the app was started 
+    with `--profile`)."""
+    return jsonify(metrics.get_slowest_requests())
+
 @app.route('/error-test', methods = ['POST'])
 def error_test():
     x = 3 / 0
@@ -33,35 +120,178 @@ def get_n_recent_entries():
     """Get recent entries in a library."""
     request_data = request.get_json()
     n = request_data['n']                                   # get n -> the number of recent entries to return   
-    entries = usr_lib.get_entries_by_patterns(lib_path, sort_props=[('time', 'DSC')], n=n)    # get the `n` most recent entries
-    return jsonify(entries)
+    before = request_data.get('before')                     # (optional) get before -> the [time, title] of the oldest entry from the last request, to return the next `n` entries after it (or a timestamp, to only return entries older than it)
+    return get_conditional_json_response(lambda: usr_lib.get_recent_entries(app.config['LIB_PATH'], n, before)) # get the `n` most recent entries
 
 @app.route('/lib/search', methods = ['POST'])
 def get_entries_by_search():
-    """Get all entries in a library which match a search query, sorted by most to least recent."""
+    """Get all entries in a library which match a search query, sorted by most to least recent.
+
+    The request data can also have any of these (optional) options, in which case the response
+    is an object with the `entries`, and the `cursor` to get the next page with (null if there
+    are no more):
+    - `limit` - the maximum number of entries to get (one page of results)
+    - `cursor` - the cursor from the previous page, to get the next page
+    - `fields` - the names of the entry properties to get (title is always included), which
+    can include "snippet" (the start of the content) - see `library.iter_entries_by_title()`
+    - `stream` - if true, then the response is newline-delimited JSON (one entry per line)
+    instead, which is sent as the entries are gotten, and the next page's cursor is in the
+    `X-Next-Cursor` header
+    """
     request_data = request.get_json()
     patterns = request_data['patterns']                     # get the patterns dict from the request data
-    entries = usr_lib.get_entries_by_patterns(lib_path, patterns, [('MATCHSCORE', 'DSC'), ('time', 'DSC')]) # get the matching entries, sorted by match score and recentness 
-    return jsonify(entries)
+    lib_path = app.config['LIB_PATH']
+    sort_props = [('MATCHSCORE', 'DSC'), ('time', 'DSC')]   # (sort the matching entries by match score and recentness)
+    if not request_data.keys() & {'limit', 'cursor', 'fields', 'stream'}:
+        return get_conditional_json_response(lambda: usr_lib.get_entries_by_patterns(lib_path, patterns, sort_props))
+    limit, cursor, fields = request_data.get('limit'), request_data.get('cursor'), request_data.get('fields')
+    if request_data.get('stream'):
+        titles, next_cursor = usr_lib.get_entry_page(lib_path, patterns, sort_props, limit, cursor)
+        lines = (app.json.dumps(entry) + "\n" for entry in usr_lib.iter_entries_by_title(lib_path, titles, fields))
+        return Response(lines, mimetype="application/x-ndjson", headers={'X-Next-Cursor': next_cursor} if next_cursor else {})
+    def get_page():
+        titles, next_cursor = usr_lib.get_entry_page(lib_path, patterns, sort_props, limit, cursor)
+        return {'entries': list(usr_lib.iter_entries_by_title(lib_path, titles, fields)), 'cursor': next_cursor}
+    return get_conditional_json_response(get_page)
+
+@app.route('/lib/entry', methods = ['POST'])
+def get_entry():
+    """Get a single entry in a library by its title (such as to get the full content of an
+    entry which was gotten from a search with only a snippet of its content)."""
+    title = request.get_json()['title']
+    return get_conditional_json_response(lambda: usr_lib.get_entry_by_title(app.config['LIB_PATH'], title))
+
+@app.route('/lib/titles', methods = ['GET'])
+def get_title_completions():
+    """Get the titles of entries which start with the `prefix` query parameter (ignoring case), 
+    for completing titles as they're typed. The (optional) `limit` query parameter is the most 
+    titles to get (10 by default), and `typos` is the number of typos in the prefix to allow 
+    (0 by default, and at most 2)."""
+    prefix = request.args.get('prefix', "")
+    limit = request.args.get('limit', 10, type=int)
+    typos = request.args.get('typos', 0, type=int)
+    return jsonify(usr_lib.complete_title(app.config['LIB_PATH'], prefix, limit, typos))
+
+@app.route('/lib/changes', methods = ['GET'])
+def get_changed_entries():
+    """Get the entries in a library which changed since a change cursor (the `since` query 
+    parameter). The response has the `cursor` to use for the next request, and the `changes` 
+    (see `library.get_changes()`) - this is null if the cursor was missing or too old, meaning 
+    that all entries should be gotten again."""
+    return jsonify(get_library_changes(request.args.get('since')))
+
+@app.route('/lib/changes/stream', methods = ['GET'])
+def stream_changed_entries():
+    """Stream the changes to a library's entries as server-sent events, starting from a change 
+    cursor (the `since` query parameter, or the `Last-Event-ID` header when reconnecting). Each 
+    event's data is the same as a `/lib/changes` response, and its ID is its cursor.
+
+    Each open stream holds one of the server's threads (see `--threads`), so the stream ends 
+    after `CHANGE_STREAM_MAX_SECONDS`, and the client's EventSource reconnects with the last 
+    cursor in its `Last-Event-ID` header, continuing from where the stream ended."""
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('since')
+    def generate():
+        nonlocal cursor
+        if cursor is None:
+            cursor = get_library_changes(None)['cursor']    # (with no cursor, only stream changes from now on)
+        yield f"retry: {CHANGE_STREAM_RETRY_MS}\nid: {cursor}\n\n"  # (an ID without data isn't an event, but it's still sent back when reconnecting, so no changes are missed)
+        end_time = time.monotonic() + CHANGE_STREAM_MAX_SECONDS
+        while (remaining := end_time - time.monotonic()) > 0:
+            changes = get_library_changes(cursor, wait=True, timeout=min(CHANGE_STREAM_TIMEOUT, remaining))
+            if changes['changes'] == []:
+                yield ": keep-alive\n\n"                    # (a comment, so that the connection isn't closed while nothing changes)
+                continue
+            cursor = changes['cursor']
+            yield f"id: {cursor}\ndata: {json.dumps(changes)}\n\n"
+    return Response(generate(), mimetype="text/event-stream", headers={'Cache-Control': "no-cache"})
+
+### Library User Files ###
+
+@app.route('/lib/files/<path:path>', methods = ['GET'])
+def get_non_entry_file(path):
+    """Get a non-entry file in a library (such as a PDF or audio attachment), by its path in 
+    the library's non-entry folder. The file is sent straight from disk without being read 
+    into memory (with the server's `wsgi.file_wrapper`, which can use `sendfile()`), and the 
+    response supports conditional requests (`If-None-Match`/`If-Modified-Since`, with an 
+    ETag from the file's modification time and size) and `Range` requests (for seeking in 
+    media, or resuming downloads)."""
+    try:
+        full_path = usr_lib.get_non_entry_file_path(app.config['LIB_PATH'], path)
+    except FileNotFoundError:
+        abort(404)
+    except PermissionError:
+        abort(403)
+    return send_file(full_path, conditional=True, etag=True)
 
 @app.route('/lib/new', methods = ['POST'])
 def new_entry():
     """Create a new entry in a library."""
     entry_props = request.get_json()                        # the value parsed from the request should be a dictionary of all of the entry properties
-    usr_lib.create_entry(lib_path, entry_props)             # create the entry with the library module, adding library path
+    usr_lib.create_entry(app.config['LIB_PATH'], entry_props)             # create the entry with the library module, adding library path
     return jsonify(None)
 
+@app.route('/lib/batch', methods = ['POST'])
+def apply_entry_batch():
+    """Create, update, and/or delete many entries in a library at once."""
+    ops = request.get_json()['ops']                         # get the list of operations -> each is a dict with an "op" ("create", "update", or "delete") and its data
+    results = usr_lib.apply_batch(app.config['LIB_PATH'], ops)            # apply all of the operations, getting a result for each
+    return jsonify(results)
+
 
 ######### App Starting Script #########
 
+def print_warm_up_progress(done:int, total:int):
+    print(f"Indexing library entries: {done}/{total}", end="\n" if done == total else "\r")
+
 if __name__ == "__main__":
-    try:
-        lib_path = argv[1]
-    except:
-        # if no library folder path is provided, then use the test_library folder as a default
-        lib_path = Path(__file__).parent.parent / "_test_library"
+    arg_parser = ArgumentParser(description="Start the app server for a library.")
+    arg_parser.add_argument('lib_path', nargs='?', default=Path(__file__).parent.parent / "_test_library",
+        help="the path of the library folder (if not provided, then the test_library folder is used as a default)")
+    arg_parser.add_argument('--workers', type=int, default=None,
+        help="the number of processes used to index the library at startup (defaults to the number of CPUs)")
+    arg_parser.add_argument('--block-during-warm-up', action='store_true',
+        help="make requests wait until the library is indexed, rather than being slower until then")
+    arg_parser.add_argument('--text-index', action='store_true',
+        help="build a text index of all entries at startup, so that text searches only need to check candidate entries (this keeps every entry's content in memory, along with an index a few times its size)")
+    arg_parser.add_argument('--serve', action='store_true',
+        help="run in production mode, with the waitress server (install it with `pip install waitress`) and without debugging")
+    arg_parser.add_argument('--host', default="127.0.0.1",
+        help="the host to serve the app on (defaults to 127.0.0.1)")
+    arg_parser.add_argument('--port', type=int, default=5000,
+        help="the port to serve the app on (defaults to 5000)")
+    arg_parser.add_argument('--threads', type=int, default=8,
+        help=f"the number of threads which handle requests in production mode (each open change stream holds one, for up to {CHANGE_STREAM_MAX_SECONDS} seconds at a time)")
+    arg_parser.add_argument('--profile', type=int, metavar='N', default=0,
+        help="keep the phase breakdowns of the N slowest requests, which are printed when the app stops (and are at /metrics/slowest)")
+    arg_parser.add_argument('--profile-sample-rate', type=float, default=1.0,
+        help="the fraction of requests to profile with `--profile` (defaults to all of them)")
+    arg_parser.add_argument('--migrate-layout', choices=["flat", "sharded"],
+        help="move the library's entry files into this layout (sharded spreads them across 256 sub-folders, for very large libraries), and then exit")
+    args = arg_parser.parse_args()
+    if args.serve and waitress_serve is None:
+        arg_parser.error("`--serve` needs the waitress server, which isn't installed (install it with `pip install waitress`)")
+    lib_path = args.lib_path
+    app.config['LIB_PATH'] = lib_path                       # (the endpoints get the library path from here)
     
     usr_lib.validate_library(lib_path)                      # make sure the user library is valid before starting the app
+    if args.migrate_layout:
+        moved = usr_lib.migrate_library_layout(lib_path, args.migrate_layout)
+        print(f"Moved {moved} entry files into the {args.migrate_layout} layout.")
+        raise SystemExit
+    # In debug mode, werkzeug's reloader runs this script again in a child process, which is the one that actually serves the app 
+    # (with `WERKZEUG_RUN_MAIN` set) - so the library is only warmed up in that process, rather than in both:
+    if args.serve or os.environ.get('WERKZEUG_RUN_MAIN') == "true":
+        usr_lib.start_warm_up(lib_path, workers=args.workers, text_index=args.text_index, snapshot=True, watch=True, blocking=args.block_during_warm_up, progress=print_warm_up_progress)
+            # ^ read and index all library entries in the background (building the text index if enabled, so that searches only need to check candidate entries)
+            # (starting from the library's snapshot, so only entries which changed since the app last ran are read)
+            # (and then watching the library for changes made outside the app, so it never needs to be scanned again)
+        atexit.register(usr_lib.save_snapshot, lib_path)    # save a new snapshot of the library's entries when the app stops
+        if args.profile:
+            metrics.enable_profiler(args.profile, args.profile_sample_rate)
+            atexit.register(lambda: print(f"\nSlowest requests:\n{metrics.format_slowest_requests()}"))
 
-    app.run(debug=True)                                     # this is blocking (so must run other stuff in threads)
-        # `debug=True` should only be while testing!
+    if not args.serve:
+        app.run(host=args.host, port=args.port, debug=True) # this is blocking (so must run other stuff in threads)
+            # `debug=True` should only be while testing!
+    else:
+        waitress_serve(app, host=args.host, port=args.port, threads=args.threads)
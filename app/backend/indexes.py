@@ -0,0 +1,268 @@
+from bisect import bisect_left, bisect_right, insort
+from array import array
+import heapq
+from operator import itemgetter
+
+########################
+######### Data #########
+########################
+
+# The length of the substrings (n-grams) which text values are broken up into for indexing:
+_GRAM_SIZE = 3
+
+
+#####################################
+######### Support Functions #########
+#####################################
+
+def _get_grams(text:str) -> set[str]:
+    """Get the set of all unique substrings of length `_GRAM_SIZE` within a string."""
+    return {text[i:i+_GRAM_SIZE] for i in range(len(text) - _GRAM_SIZE + 1)}
+
+def _insert_id(ids:array, entry_id:int):
+    """Insert an entry ID into a sorted array of IDs (unless it's already in it)."""
+    if not ids or ids[-1] < entry_id:
+        ids.append(entry_id)                                # (the usual case, as new entries get the highest IDs)
+        return
+    i = bisect_left(ids, entry_id)
+    if ids[i] != entry_id:
+        ids.insert(i, entry_id)
+
+def _remove_id(ids:array, entry_id:int):
+    """Remove an entry ID from a sorted array of IDs (does nothing if it isn't in it)."""
+    i = bisect_left(ids, entry_id)
+    if i < len(ids) and ids[i] == entry_id:
+        del ids[i]
+
+def _has_id(ids:array, entry_id:int) -> bool:
+    """Check whether an entry ID is in a sorted array of IDs."""
+    i = bisect_left(ids, entry_id)
+    return i < len(ids) and ids[i] == entry_id
+
+def get_text_value(value) -> str|None:
+    """Get the lowercase text form of an entry property value, in the same way that values
+    are prepared for pattern matching (lists are joined into a single string). Returns None
+    for any value which isn't text (or a list of text), or is empty."""
+    if isinstance(value, list):
+        value = ', '.join(str(x) for x in value)            # if the property value is a list, convert it to a string first
+    if not (value and isinstance(value, str)):
+        return None
+    return value.lower()
+
+
+###########################
+######### Indexes #########
+###########################
+
+class TextIndex:
+    """An inverted index for the text (string and list) properties of library entries.
+
+    Each property value is broken up into all of its lowercase substrings of length 3 (trigrams),
+    and each trigram maps to the entries whose value contains it ("postings"), separately for each
+    property. Any entry whose value contains some token must then have all of that token's trigrams
+    in its postings, so intersecting them gives a (usually very small) set of candidate entries,
+    which only need to be checked for the actual substring afterwards.
+
+    To keep the index small, each entry is given an integer ID the first time it's added (IDs are
+    never reused for another title), and each trigram's postings are a sorted array of entry IDs
+    (4 bytes each), rather than a set of titles.
+
+    Tokens shorter than 3 characters can't be narrowed down this way, so for them all entries which
+    have the property at all are returned as candidates."""
+
+    def __init__(self):
+        self.ids = {}                                       # entry title -> the entry's ID
+        self.titles = []                                    # entry ID -> the entry's title
+        self.postings = {}                                  # property name -> {trigram -> sorted array of entry IDs}
+        self.prop_postings = {}                             # property name -> sorted array of the IDs of all entries which have a (non-empty) text value for the property
+
+    def add(self, entry:dict):
+        """Add all of an entry's text properties to the index."""
+        title = entry['title']
+        entry_id = self.ids.get(title)
+        if entry_id is None:
+            entry_id = self.ids[title] = len(self.titles)   # (a new ID is always the highest, so it's simply appended to each of its postings)
+            self.titles.append(title)
+        for prop_name, value in entry.items():
+            value = get_text_value(value)
+            if value is None:
+                continue                                    # only index text values
+            if prop_name not in self.prop_postings:
+                self.prop_postings[prop_name] = array('I')
+                self.postings[prop_name] = {}
+            _insert_id(self.prop_postings[prop_name], entry_id)
+            prop_postings = self.postings[prop_name]
+            for gram in _get_grams(value):
+                ids = prop_postings.get(gram)
+                if ids is None:
+                    prop_postings[gram] = array('I', (entry_id,))
+                else:
+                    _insert_id(ids, entry_id)
+
+    def remove(self, entry:dict):
+        """Remove all of an entry's text properties from the index. `entry` must be the same
+        entry dict (or an identical one) that was added."""
+        entry_id = self.ids.get(entry['title'])
+        if entry_id is None:
+            return
+        for prop_name, value in entry.items():
+            value = get_text_value(value)
+            if value is None:
+                continue
+            _remove_id(self.prop_postings[prop_name], entry_id)
+            prop_postings = self.postings[prop_name]
+            for gram in _get_grams(value):
+                ids = prop_postings[gram]
+                _remove_id(ids, entry_id)
+                if not ids:
+                    del prop_postings[gram]                 # remove any grams which no longer have postings, so the index doesn't grow forever
+
+    def get_candidates(self, prop_name:str, token:str) -> set[str]:
+        """Get the titles of all entries whose `prop_name` property value *could* contain
+        `token` (which must be lowercase)."""
+        if len(token) < _GRAM_SIZE:
+            return {self.titles[entry_id] for entry_id in self.prop_postings.get(prop_name, ())}
+        prop_postings = self.postings.get(prop_name, {})
+        gram_postings = []
+        for gram in _get_grams(token):
+            ids = prop_postings.get(gram)
+            if not ids:
+                return set()                                # if any trigram is in no entries at all, then no entry can contain the token
+            gram_postings.append(ids)
+        gram_postings.sort(key=len)                         # intersect starting with the smallest postings, so the intermediate results stay small
+        candidates = gram_postings[0]
+        for ids in gram_postings[1:]:
+            if len(candidates) * 16 < len(ids):
+                candidates = [entry_id for entry_id in candidates if _has_id(ids, entry_id)]  # (few candidates are left, so look each one up with bisection)
+            else:
+                candidates = set(candidates).intersection(ids)
+            if not candidates:
+                break
+        return {self.titles[entry_id] for entry_id in candidates}
+
+class SortedIndex:
+    """A list of (value, title) pairs for the values of a single property of library entries,
+    kept sorted by value (then title), so that ranges of values can be found with bisection."""
+
+    def __init__(self, values:dict=None):
+        """`values` (optional) is a dict of entry titles and their values to start with."""
+        self.values = dict(values or {})                    # entry title -> value
+        self.keys = sorted((value, title) for title, value in self.values.items())   # the sorted list of (value, title) pairs
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, title:str, value:int|float):
+        """Add (or replace) the value of an entry."""
+        if title in self.values:
+            self.remove(title)
+        insort(self.keys, (value, title))
+        self.values[title] = value
+
+    def remove(self, title:str):
+        """Remove the value of an entry (does nothing if it isn't in the index)."""
+        value = self.values.pop(title, None)
+        if value is not None:
+            del self.keys[bisect_left(self.keys, (value, title))]
+
+    def get_range(self, low:int|float, high:int|float) -> list[str]:
+        """Get the titles of all entries whose value is between `low` and `high` (inclusive),
+        sorted from lowest to highest value."""
+        start = bisect_left(self.keys, low, key=itemgetter(0))
+        end = bisect_right(self.keys, high, key=itemgetter(0))
+        return [title for _, title in self.keys[start:end]]
+
+    def get_last(self, n:int, before:int|float|tuple=None) -> list[str]:
+        """Get the titles of the `n` entries with the highest values (sorted from highest to lowest),
+        only including those before `before` (if provided). This is either a value (to only include
+        values which are less than it), or a (value, title) pair (to only include entries which come
+        before it in the index - so entries with the same value as it aren't skipped)."""
+        if before is None:
+            end = len(self.keys)
+        elif isinstance(before, (tuple, list)):
+            end = bisect_left(self.keys, tuple(before))
+        else:
+            end = bisect_left(self.keys, before, key=itemgetter(0))
+        return [title for _, title in reversed(self.keys[max(end - n, 0):end])]
+
+class TitleIndex:
+    """A sorted list of (key, title) pairs for the titles of library entries, where each key is
+    the case-folded title, so that the titles which start with some text (in any case) can be
+    found with bisection.
+
+    Titles can also be found by "fuzzy" prefixes (with a few typos) - see `get_fuzzy()`. As the
+    keys are sorted, keys which start with the same text are next to each other, so the edit
+    distances for the start of each key are shared with the key before it (like walking down a
+    trie), and whole ranges of keys can be skipped once their shared start is too different."""
+
+    def __init__(self, titles=()):
+        """`titles` (optional) is an iterable of entry titles to start with."""
+        self.titles = set(titles)
+        self.keys = sorted((title.casefold(), title) for title in self.titles)   # the sorted list of (key, title) pairs
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, title:str):
+        """Add an entry's title (does nothing if it's already in the index)."""
+        if title not in self.titles:
+            insort(self.keys, (title.casefold(), title))
+            self.titles.add(title)
+
+    def remove(self, title:str):
+        """Remove an entry's title (does nothing if it isn't in the index)."""
+        if title in self.titles:
+            del self.keys[bisect_left(self.keys, (title.casefold(), title))]
+            self.titles.discard(title)
+
+    def get_prefix(self, prefix:str, n:int) -> list[str]:
+        """Get the first `n` titles (in case-folded order) which start with `prefix`, ignoring case."""
+        prefix = prefix.casefold()
+        titles = []
+        for i in range(bisect_left(self.keys, (prefix,)), len(self.keys)):
+            key, title = self.keys[i]
+            if len(titles) == n or not key.startswith(prefix):
+                break
+            titles.append(title)
+        return titles
+
+    def get_fuzzy(self, prefix:str, n:int, max_distance:int) -> list[str]:
+        """Get the `n` titles whose start is closest to `prefix` (ignoring case), within an edit
+        distance (the number of characters inserted, deleted, or changed) of `max_distance`.
+        Titles are sorted by their distance, and then in case-folded order."""
+        prefix = prefix.casefold()
+        rows = [list(range(len(prefix) + 1))]              # row d -> the edit distance between each start of `prefix` and the first d characters of `path`
+        best = [len(prefix)]                                # depth d -> the smallest edit distance between `prefix` and any start of `path[:d]`
+        path = ""                                           # the start of the current key which the rows are for
+        matches = []
+        i = 0
+        while i < len(self.keys):
+            key, title = self.keys[i]
+            shared = 0
+            for a, b in zip(key, path):
+                if a != b:
+                    break
+                shared += 1
+            del rows[shared + 1:], best[shared + 1:]       # (keep the rows for the start of the key which is the same as the last one)
+            path = path[:shared]
+            for char in key[shared:]:
+                last = rows[-1]
+                row = [last[0] + 1]
+                for j, prefix_char in enumerate(prefix, 1):
+                    row.append(min(last[j] + 1, row[j - 1] + 1, last[j - 1] + (prefix_char != char)))
+                rows.append(row)
+                best.append(min(best[-1], row[-1]))
+                path += char
+                if min(row) > max_distance:
+                    break                                   # (adding more characters can never make the distance smaller again)
+            if min(rows[-1]) > max_distance:
+                # Every key which starts with `path` has the same distance, so only the first `n` of them are needed (if any), and the rest are skipped:
+                end = bisect_left(self.keys, (path[:-1] + chr(ord(path[-1]) + 1),), i + 1)
+                if best[-1] <= max_distance:
+                    matches.extend((best[-1], key, title) for key, title in self.keys[i:min(end, i + n)])
+                i = end
+                continue
+            if best[-1] <= max_distance:
+                matches.append((best[-1], key, title))
+            i += 1
+        return [title for _, _, title in heapq.nsmallest(n, matches)]
@@ -1,6 +1,29 @@
 from pathlib import Path
+from collections import OrderedDict, deque
+from functools import lru_cache, wraps
+from itertools import chain, islice
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import get_context
+from contextlib import contextmanager, nullcontext
+from threading import Condition, Event, RLock, Thread
+from time import perf_counter
+import base64
+import heapq
+import os
+import re
+import math
+import mmap
+import shutil
 import json
+import struct
+import zlib
+import yaml
 import frontmatter
+from .indexes import TextIndex, SortedIndex, TitleIndex, get_text_value
+from . import metrics
+from .rwlock import RWLock
+from .watcher import DirectoryWatcher
 
 ########################
 ######### Data #########
@@ -14,8 +37,34 @@ _DIR_PATHS = {
 _FILE_PATHS = {
     # 'database': _DIR_PATHS['data'] / "database.json",
     'settings': _DIR_PATHS['data'] / "settings.json",
+    'time_index': _DIR_PATHS['data'] / "time_index.json",
+    'time_index_log': _DIR_PATHS['data'] / "time_index.log",
+    'snapshot': _DIR_PATHS['data'] / "entries.snapshot",
 }
 
+# The ways that entry files can be laid out in a library directory (the library's settings have the one used, as "layout"):
+# - "flat" -> every entry file is directly in the library directory (the default)
+# - "sharded" -> every entry file is in one of 256 sub-directories ("00" to "ff"), chosen by a hash of its title
+_LAYOUTS = ("flat", "sharded")
+_SHARD_DIRS = tuple(f"{i:02x}" for i in range(256))
+_SHARD_SCAN_WORKERS = 8                                     # the number of threads which scan shard directories at the same time
+
+# The header at the start of every entry cache snapshot file - a "magic" identifier, the snapshot 
+# format version, the CRC-32 checksum of the snapshot data (to catch corruption), and the length of 
+# the snapshot data (which is plain JSON - never code, since the library directory may be written by anything):
+_SNAPSHOT_HEADER = struct.Struct('<8sHIQ')
+_SNAPSHOT_MAGIC = b"EDOSNAP\0"
+_SNAPSHOT_VERSION = 2                                       # (this must be increased whenever the format of the snapshot data changes)
+
+# The YAML loader for entry front-matter (the C-accelerated one from libyaml, if it's available):
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# The YAML dumper for entry front-matter (the C-accelerated one, if it's available - it gives the same output):
+_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# The syntax for a front-matter boundary line (same as the one used by the `frontmatter` package):
+_FM_BOUNDARY = re.compile(r'-{3,}\s*')
+
 # File characters that cannot be in filenames:
 _ILLEGAL_FILE_CHARS = '<>:"/\|?*'
 
@@ -27,6 +76,32 @@ _BASE_PROPERTIES = {
     'content': str                                          # 'content' is the actual content of an entry
 }
 
+# The maximum number of search results kept in each library's result cache:
+_RESULT_CACHE_SIZE = 64
+
+# The fewest records that the time index log can have before it's compacted into the time index file 
+# (it's compacted once it has this many records, or as many as the time index has entries - whichever is more):
+_TIME_INDEX_LOG_MIN = 1000
+
+# The maximum number of changes kept in each library's change log:
+_CHANGE_LOG_SIZE = 1000
+
+# The default number of characters of content in an entry's `snippet` (see `iter_entries_by_title()`):
+_SNIPPET_LENGTH = 200
+
+# The size of each chunk that non-entry files are read and written in (so large files are never all in memory at once):
+_NON_ENTRY_CHUNK_SIZE = 1024 * 1024
+
+# The most typos allowed when completing titles (each one makes many more titles match, so completing takes much longer):
+_MAX_TITLE_TYPOS = 2
+
+# The in-memory entry caches for each library which has been accessed (keyed by the library's resolved path):
+_entry_caches = {}
+_entry_caches_lock = RLock()                                # (held while creating a new entry cache, so that no two threads can create one for the same library)
+
+# The layout of each library which has been accessed (keyed by the library path as it was given):
+_layouts = {}
+
 
 #####################################
 ######### Support Functions #########
@@ -52,9 +127,30 @@ def validate_library(lib_dir:str) -> Path:
                     json.dump({}, f, indent=1)              # if the path specifies a JSON file, create JSON with an empty dictionary (object)
                 else:
                     f.write("")                             # otherwise just create an empty file
-    # 3) Return Path object of library dir string:
+    # 3) If the entry files are in shard directories, then make sure that each of those exists too:
+    if _get_layout(lib_dir) == "sharded":
+        for shard_dir in _SHARD_DIRS:
+            (lib_path / shard_dir).mkdir(exist_ok=True)
+    # 4) Return Path object of library dir string:
     return lib_path
 
+def _read_settings(lib_dir:str) -> dict:
+    try:
+        with open(Path(lib_dir) / _FILE_PATHS['settings']) as f:
+            settings = json.load(f)
+    except (FileNotFoundError, ValueError):
+        settings = {}
+    return settings if isinstance(settings, dict) else {}
+
+def _get_layout(lib_dir:str) -> str:
+    """Get the layout of a library's entry files (see `_LAYOUTS`), from its settings."""
+    layout = _layouts.get(lib_dir)
+    if layout is None:
+        layout = _read_settings(lib_dir).get('layout', "flat")
+        assert layout in _LAYOUTS, f'The library {lib_dir} has an unknown layout "{layout}" in its settings.'
+        _layouts[lib_dir] = layout
+    return layout
+
 def _validate_entry_data(entry_data:dict):
     """Ensure that an entry has all valid properties and values."""
     # 1) First make sure the base properties are present and have valid values:
@@ -83,21 +179,29 @@ def _validate_entry_data(entry_data:dict):
 
 ### Entry Filepath Generation ###
 
-def _get_entry_filepath(lib_dir:str, title:str) -> Path:
+def _get_shard_dir(title:str) -> str:
+    """Get the name of the shard directory for an entry in a sharded library (see `_LAYOUTS`)."""
+    return _SHARD_DIRS[zlib.crc32(title.encode('utf-8')) & 0xff]
+
+def _get_entry_filepath(lib_dir:str, title:str, layout:str=None) -> Path:
     """Get a complete path (Path object) for a library entry markdown file, where
     the file name matches the title. Any characters in the title string which are 
     illegal in file names, will be converted to their Unicode "code-point" surrounded 
-    by `%` symbols."""
+    by `%` symbols. If the library is sharded (or `layout` is "sharded"), then the file 
+    is in the shard directory for the title."""
     safe_file_name = ""
     for char in title:
         if (not char.isascii()) or (char in (_ILLEGAL_FILE_CHARS + '%')):
             char = f"%{ord(char)}%"
         safe_file_name += char
+    if (layout or _get_layout(lib_dir)) == "sharded":
+        return Path(lib_dir) / _get_shard_dir(title) / (safe_file_name + ".md")
     return Path(lib_dir) / (safe_file_name + ".md") 
 
 def _get_entry_title_from_filepath(filepath:str) -> str:
     """Get an entry title from its file name, un-encoding any file safe character 
-    representations back to their original characters"""
+    representations back to their original characters (only the file name is used, so 
+    this works for paths in either layout)."""
     title = ""
     current_code = ""
     for char in Path(filepath).stem:                        # iterate through each character of the file path name (without suffix)
@@ -118,6 +222,729 @@ def _get_entry_title_from_filepath(filepath:str) -> str:
             title += char
     return title
 
+### Entry File Reading ###
+
+def _normalize_content(content:str) -> str:
+    """Get an entry's content the same as `frontmatter` would load it from a file (with universal 
+    newlines, and stripped)."""
+    return content.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+def _decode_content(data:bytes) -> str:
+    """Convert the raw bytes of an entry's content into the same string `frontmatter` would 
+    load (decoded with universal newlines, and stripped)."""
+    return _normalize_content(data.decode('utf-8'))
+
+def _read_entry_file(filepath:Path, include_content:bool=True) -> tuple[dict, str|None, int|None]:
+    """Read an entry file, and return a tuple of its front-matter properties (dict), its content 
+    (or None if `include_content` is False), and the byte offset where its content starts (or None 
+    if unknown).
+
+    This only reads up to the end of the front-matter block (unless `include_content` is True), 
+    and parses it with the C-accelerated YAML loader if possible. The result is the same as 
+    `frontmatter.load()`, which is used instead for any file this can't handle (such as files 
+    which don't start with a front-matter boundary line, or which contain `\r` line endings)."""
+    with open(filepath, 'rb') as f:
+        line = f.readline()
+        if _FM_BOUNDARY.fullmatch(line.decode('utf-8')):    # only continue if the file starts with a boundary line
+            fm_lines = []
+            while line := f.readline():                     # read each line until the closing boundary line
+                line = line.decode('utf-8')
+                if '\r' in line:
+                    break                                   # (leave files with `\r` line endings to `frontmatter`)
+                if _FM_BOUNDARY.fullmatch(line):
+                    content_offset = f.tell()
+                    metadata = yaml.load(''.join(fm_lines), Loader=_YAML_LOADER)
+                    if not isinstance(metadata, dict):
+                        metadata = {}
+                    content = _decode_content(f.read()) if include_content else None
+                    return metadata, content, content_offset
+                fm_lines.append(line)
+    post = frontmatter.load(filepath)                       # otherwise, fall back to reading the entry file with `frontmatter`
+    return post.metadata, post.content, None
+
+def _scan_entry_dir(dir_path:Path, prefix:str="", signatures:bool=True):
+    """Iterate through the (file name, signature) of every entry file directly within a directory, 
+    adding `prefix` to the start of each file name. Does nothing if the directory doesn't exist. 
+    If `signatures` is False, then each signature is None instead (so no file is stat-ed)."""
+    try:
+        with os.scandir(dir_path) as dir_entries:
+            for dir_entry in dir_entries:
+                if not (dir_entry.name.endswith(".md") and dir_entry.is_file()):
+                    continue                                # if the path isn't a markdown file, then it can't be considered an entry
+                if not signatures:
+                    yield prefix + dir_entry.name, None
+                    continue
+                try:
+                    yield prefix + dir_entry.name, _EntryCache._get_signature(dir_entry.stat())
+                except FileNotFoundError:
+                    continue                                # (the file was deleted since the directory was listed)
+    except FileNotFoundError:
+        return
+
+def _iter_entry_files(lib_path:Path, layout:str, signatures:bool=True):
+    """Iterate through the (file name, signature) of every entry file in a library, where each 
+    file name is relative to the library directory (see `_scan_entry_dir()` for `signatures`). 
+    In a sharded library, the shard directories are scanned by a pool of threads at the same 
+    time (listing a directory is mostly waiting on the file system, so this is much faster on 
+    slow or network drives), only a few shards ahead of the entry files being iterated through 
+    (so that they're never all kept in memory)."""
+    if layout != "sharded":
+        yield from _scan_entry_dir(lib_path, signatures=signatures)
+        return
+    scan = lambda shard_dir: list(_scan_entry_dir(lib_path / shard_dir, shard_dir + "/", signatures))
+    with ThreadPoolExecutor(max_workers=_SHARD_SCAN_WORKERS) as executor:
+        shard_dirs = iter(_SHARD_DIRS)
+        pending = deque(executor.submit(scan, shard_dir) for shard_dir in islice(shard_dirs, _SHARD_SCAN_WORKERS * 2))
+        while pending:
+            entry_files = pending.popleft().result()
+            next_shard_dir = next(shard_dirs, None)
+            if next_shard_dir is not None:
+                pending.append(executor.submit(scan, next_shard_dir))   # (start scanning another shard for each one that's done)
+            yield from entry_files
+
+### Library Entry Cache ###
+
+class _EntryCache:
+    """An in-memory cache of all of the parsed entries in a single library.
+
+    Each entry is stored along with the "signature" of its file (modification time, size, 
+    and inode), so that whenever the cache is refreshed, only the files which were added 
+    or changed since the last refresh need to be read and parsed again. The library write 
+    functions also update the cache in place, so that their own changes never need to be 
+    re-read.
+
+    Entry content is loaded lazily - only the front-matter of each entry file is read at first, 
+    and the content is then read (and kept) the first time it is needed (see `get_content()`).
+
+    The `stats` dict counts cache hits (entries which were still valid), misses (entries 
+    which had to be read for the first time), and reloads (entries which had to be read 
+    again because their file changed), as well as the hits and misses of the result cache.
+
+    If enabled, the cache also keeps a `TextIndex` of all entries, which is updated whenever 
+    an entry is added, changed, or removed. Similarly, a `SortedIndex` is kept for each number 
+    property that has been searched, so that number patterns can be matched with bisection.
+
+    All access to the cache (and to the library's entry files) should be done while holding 
+    its `lock` - a reader/writer lock, which the public library functions hold for reading or 
+    writing with the `_read_locked` and `_write_locked` decorators. This way many searches can 
+    run at once, while writes are never seen half done. Reading can still change the cache (such 
+    as re-reading an entry file which changed), so the methods which readers use hold `mutex` 
+    while they run.
+
+    Whenever any cached entry is added, changed, or removed, the cache's `generation` is 
+    increased, and the change is recorded in the cache's change log (see `get_changes()`). 
+    Entries which are read for the first time before the whole library has been scanned are 
+    not recorded as created though, as they aren't new (they just weren't cached yet).
+
+    Search results are kept in a small LRU result cache, keyed by the search and the 
+    generation they were found at, so a repeated search doesn't need to be run again until 
+    the library changes (see `get_result()` and `set_result()`).
+
+    If the library is being watched (see `watch_library()`), then the watcher updates the 
+    cached entries for any entry files which change, as they change. Once the whole library 
+    has been scanned since the watcher started, the cache no longer needs to be refreshed by 
+    scanning the library directory, so `refresh()` returns straight away.
+
+    The cache also holds the library's time index (once loaded) - a `SortedIndex` of the time 
+    of every entry, which is persisted in the library's `.data` directory, so that the most 
+    recent entries can be found without reading every entry file (see `get_time_index()`). 
+    Each write only appends its changes to the time index's log file, which is compacted into 
+    the time index file now and then, so that writes don't need to save the whole index.
+
+    Similarly, the cache holds the library's title index (once it's needed) - a `TitleIndex` of 
+    the title of every entry file, which is built from the entry file names alone, so that titles 
+    can be completed without reading any entry files (see `get_title_index()`)."""
+
+    def __init__(self, lib_path:Path):
+        self.lib_path = lib_path
+        self.layout = _get_layout(lib_path)                 # the layout of the library's entry files (see `_LAYOUTS`)
+        self.entries = {}                                   # entry title -> entry dict (containing all properties, including title, but NOT content)
+        self.contents = {}                                  # entry title -> content (only for entries whose content has been loaded)
+        self.content_offsets = {}                           # entry title -> the byte offset of the content in the entry's file (or None if unknown)
+        self.signatures = {}                                # entry title -> signature of the entry's file when it was last read
+        self.positions = {}                                 # entry title -> the order in which the entry was first cached (matches the order of `entries`)
+        self.stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'result_hits': 0, 'result_misses': 0}
+        self.text_index = None                              # the text index for all entries (None if not enabled)
+        self.number_indexes = {}                            # property name -> the sorted index for all number values of the property (only for properties which have been searched)
+        self.time_index = None                              # the time index for all entries (None if not loaded yet)
+        self.time_index_dir_mtime = None                    # the modification time of the library directory (see `_get_dir_mtime()`) when the time index was last known to be up to date
+        self.time_index_changes = []                        # the (title, time) of each change to the time index since it was last saved (time is None if the entry was removed)
+        self.time_index_log_size = 0                        # the number of records in the time index log file
+        self.title_index = None                             # the title index for all entry files (None if not built yet)
+        self.title_index_dir_mtime = None                   # the modification time of the library directory when the title index was built
+        self.generation = 0                                 # increased whenever any cached entry is added, changed, or removed
+        self.changes = deque(maxlen=_CHANGE_LOG_SIZE)       # the change log -> (generation, title, action) of the most recent changes, where action is "created", "updated", or "deleted"
+        self.changes_start = 0                              # the change log has a record for every generation after this one
+        self.scanned = False                                # whether the whole library directory has been scanned yet (by `refresh()`)
+        self.watcher = None                                 # the `DirectoryWatcher` of the library directory (None if it isn't watched)
+        self.watcher_synced = False                         # whether the whole library directory has been scanned since the watcher started
+        self.results = OrderedDict()                        # the result cache -> search key (including the generation) -> list of matching entries, from least to most recently used
+        self.lock = RWLock()
+        self.mutex = RLock()                                # (held by the methods which can change the cache while the lock is only held for reading)
+        self.changed = Condition(self.mutex)                # (notified whenever the generation is increased)
+        self._next_position = 0
+
+    def _get_dir_mtime(self) -> int:
+        """Get the latest modification time of the directories which contain the library's entry 
+        files (which changes whenever any entry file is added or removed)."""
+        dir_mtime = os.stat(self.lib_path).st_mtime_ns
+        if self.layout == "sharded":
+            for shard_dir in _SHARD_DIRS:
+                try:
+                    dir_mtime = max(dir_mtime, os.stat(self.lib_path / shard_dir).st_mtime_ns)
+                except FileNotFoundError:
+                    continue
+        return dir_mtime
+
+    @staticmethod
+    def _get_signature(stat:os.stat_result) -> tuple:
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _record_change(self, title:str=None, action:str=None):
+        """Increase the generation, and record the change to an entry in the change log. If no 
+        `action` is given, then the change isn't recorded, so the change log will only cover 
+        the generations after this one."""
+        with self.mutex:
+            self.generation += 1
+            if action is None:
+                self.changes_start = self.generation
+            else:
+                if len(self.changes) == self.changes.maxlen:
+                    self.changes_start = self.changes[0][0]     # (the oldest change is about to be removed from the change log)
+                self.changes.append((self.generation, title, action))
+            self.changed.notify_all()
+
+    @staticmethod
+    def _join_content(entry:dict, content:str) -> dict:
+        """Get a new entry dict containing all properties of a cached entry, including its content."""
+        full_entry = {'title': entry['title'], 'content': content}
+        full_entry.update(entry)
+        return full_entry
+
+    def _set_entry(self, entry:dict, signature:tuple, content:str=None, content_offset:int=None):
+        """Add or replace an entry in the cache, keeping all indexes up to date. `content` must 
+        be provided if the text index is enabled."""
+        title = entry['title']
+        old_entry = self.entries.get(title)
+        if old_entry is None:
+            self.positions[title] = self._next_position
+            self._next_position += 1
+        if self.text_index is not None:
+            if old_entry is not None:
+                self.text_index.remove(self._join_content(old_entry, self.contents[title]))
+            self.text_index.add(self._join_content(entry, content))
+        for prop_name, number_index in self.number_indexes.items():
+            if _is_number(entry.get(prop_name)):
+                number_index.add(title, entry[prop_name])
+            else:
+                number_index.remove(title)
+        if self.time_index is not None:
+            time = entry['time'] if _is_number(entry.get('time')) else None
+            if self.time_index.values.get(title) != time:
+                self.time_index_changes.append((title, time))   # (only actual changes are logged - not entries which are just being cached)
+                if time is None:
+                    self.time_index.remove(title)
+                else:
+                    self.time_index.add(title, time)
+        if self.title_index is not None:
+            self.title_index.add(title)
+        self.entries[title] = entry
+        self.signatures[title] = signature
+        self.content_offsets[title] = content_offset
+        if content is None:
+            self.contents.pop(title, None)
+        else:
+            self.contents[title] = content
+        if old_entry is not None:
+            self._record_change(title, "updated")
+        else:
+            self._record_change(title, "created" if self.scanned else None)
+
+    def _load(self, path:Path, title:str, signature:tuple, include_content:bool=False):
+        """Read an entry file and store it in the cache, counting it as a miss or reload. The 
+        content is only read if `include_content` is True (or if the text index is enabled)."""
+        self.stats['reloads' if title in self.entries else 'misses'] += 1
+        with metrics.span("parse"):
+            metadata, content, content_offset = _read_entry_file(path, include_content or (self.text_index is not None))
+        self._set_entry(dict({'title':title}, **metadata), signature, content, content_offset)
+
+    def refresh(self) -> list[dict]:
+        """Bring the cache up to date with the library directory, and return a list of all 
+        cached entries. Only entry files whose signature changed are re-read, and entries whose 
+        files no longer exist are removed. If the watcher is keeping the cache up to date, then 
+        this doesn't need to do anything."""
+        with self.mutex, metrics.span("refresh"):
+            if self.watcher_synced and self.watcher.is_alive():
+                return list(self.entries.values())
+            seen_titles = set()
+            dir_mtime = self._get_dir_mtime()               # (get this before reading the directory, so that any changes made while reading it are never missed)
+            for filename, signature in _iter_entry_files(self.lib_path, self.layout):  # iterate through each entry file in the library directory (or its shard directories)
+                title = _get_entry_title_from_filepath(filename)
+                seen_titles.add(title)
+                if self.signatures.get(title) == signature:
+                    self.stats['hits'] += 1                 # the file hasn't changed since it was last read, so the cached entry is still valid
+                else:
+                    self._load(self.lib_path / filename, title, signature)
+            for title in self.entries.keys() - seen_titles:   # remove any cached entries whose files no longer exist
+                self.discard(title)
+            if self.time_index is not None:
+                self.time_index_dir_mtime = dir_mtime       # the time index was updated along with all of the entries, so it's now up to date
+            if self.title_index is not None:
+                if len(self.title_index) != len(self.entries):
+                    self.title_index = TitleIndex(self.entries)  # (the title index has titles of files which were removed before they were ever cached)
+                self.title_index_dir_mtime = dir_mtime
+            self.scanned = True
+            self.watcher_synced = self.watcher is not None
+            return list(self.entries.values())
+
+    def update_files(self, filenames:set[str]):
+        """Bring the cached entries of some entry files (by file name) up to date, after the 
+        watcher found that they changed. Files which no longer exist are removed from the cache, 
+        and others are only read again if their signature changed. Files which can't be read or 
+        parsed (such as one which an editor is still in the middle of saving) are skipped, so 
+        their entries stay as they were until the files change again."""
+        with self.mutex:
+            dir_mtime = self._get_dir_mtime()
+            for filename in filenames:
+                title = _get_entry_title_from_filepath(filename)
+                path = self.lib_path / filename
+                try:
+                    signature = self._get_signature(path.stat())
+                    if self.signatures.get(title) == signature:
+                        self.stats['hits'] += 1
+                    else:
+                        self._load(path, title, signature)
+                except FileNotFoundError:
+                    self.discard(title)                     # (the file was deleted, or renamed to another file name - which will be in `filenames` too)
+                except (OSError, ValueError, yaml.YAMLError):
+                    continue                                # (the watcher will report the file again once it's changed again)
+            if self.watcher_synced and self.time_index is not None:
+                self.time_index_dir_mtime = dir_mtime       # (any later changes will be found by the watcher, and update the time index then)
+
+    def get(self, title:str) -> dict:
+        """Get a single cached entry (without content), first making sure that its file hasn't 
+        changed (and re-reading it if it has). Will raise `FileNotFoundError` if the entry 
+        doesn't exist."""
+        with self.mutex:
+            path = _get_entry_filepath(self.lib_path, title)
+            try:
+                signature = self._get_signature(path.stat())
+            except FileNotFoundError:
+                self.discard(title)
+                raise
+            if self.signatures.get(title) == signature:
+                self.stats['hits'] += 1
+            else:
+                self._load(path, title, signature)
+            return self.entries[title]
+
+    def merge_parsed(self, parsed_entries:list[tuple]):
+        """Store entries which were already read from their files (by `_read_entry_files()`), 
+        counting each as a miss or reload. Entries whose signature already matches the cached 
+        one (because the cache was refreshed after they were read) are skipped."""
+        for filename, signature, metadata, content, content_offset in parsed_entries:
+            title = _get_entry_title_from_filepath(filename)
+            if self.signatures.get(title) == signature:
+                continue                                    # (storing it again would record a change that didn't happen)
+            self.stats['reloads' if title in self.entries else 'misses'] += 1
+            self._set_entry(dict({'title':title}, **metadata), signature, content, content_offset)
+
+    def get_content(self, title:str) -> str:
+        """Get the content of a cached entry, reading it from the entry's file if it isn't 
+        loaded yet (if the file changed since it was cached, the whole entry is read again)."""
+        with self.mutex:
+            if title not in self.contents:
+                path = _get_entry_filepath(self.lib_path, title)
+                with open(path, 'rb') as f:
+                    signature = self._get_signature(os.fstat(f.fileno()))
+                    content_offset = self.content_offsets.get(title)
+                    if content_offset is not None and self.signatures.get(title) == signature:
+                        f.seek(content_offset)              # skip straight to the content, since the front-matter was already read
+                        self.contents[title] = _decode_content(f.read())
+                    else:
+                        self._load(path, title, signature, include_content=True)
+            return self.contents[title]
+
+    def with_content(self, entry:dict) -> dict:
+        """Get a new entry dict containing all properties of a cached entry, including its content."""
+        return self._join_content(entry, self.get_content(entry['title']))
+
+    def get_snippet(self, title:str, length:int) -> str:
+        """Get the first `length` characters of a cached entry's content (followed by "…" if
+        the content is longer). If the content isn't loaded yet, then only the start of it is
+        read from the entry's file (and it isn't kept, unless that was all of it)."""
+        with self.mutex:
+            content = self.contents.get(title)
+            if content is None:
+                path = _get_entry_filepath(self.lib_path, title)
+                with open(path, 'rb') as f:
+                    signature = self._get_signature(os.fstat(f.fileno()))
+                    content_offset = self.content_offsets.get(title)
+                    if content_offset is not None and self.signatures.get(title) == signature:
+                        f.seek(content_offset)
+                        size = length * 4 + 64              # (enough bytes for `length` characters of any size, after a bit of leading whitespace)
+                        data = f.read(size)
+                        if len(data) < size:
+                            content = self.contents[title] = _decode_content(data)  # (this is the whole content)
+                        else:
+                            start = data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n').lstrip()
+                            if len(start) > length:
+                                return start[:length] + "…"
+            if content is None:
+                content = self.get_content(title)           # (the file changed, or its content is mostly whitespace)
+            return content if len(content) <= length else content[:length] + "…"
+
+    def store(self, path:Path, entry:dict, signature:tuple=None):
+        """Store an entry (including its content) which was just written to `path` by this 
+        process (so it doesn't need to be read again). `signature` is the signature of the 
+        written file (if not provided, the file's signature is checked)."""
+        metadata = {name: val for name, val in entry.items() if name != 'content'}
+        self._set_entry(metadata, signature or self._get_signature(path.stat()), entry['content'])
+
+    def discard(self, title:str):
+        """Remove an entry from the cache (does nothing if it isn't cached)."""
+        entry = self.entries.pop(title, None)
+        if entry is None:
+            return
+        if self.text_index is not None:
+            self.text_index.remove(self._join_content(entry, self.contents[title]))
+        for number_index in self.number_indexes.values():
+            number_index.remove(title)
+        if self.time_index is not None and title in self.time_index.values:
+            self.time_index.remove(title)
+            self.time_index_changes.append((title, None))
+        if self.title_index is not None:
+            self.title_index.remove(title)
+        del self.signatures[title]
+        del self.positions[title]
+        del self.content_offsets[title]
+        self.contents.pop(title, None)
+        self._record_change(title, "deleted")
+
+    def get_time_index(self) -> SortedIndex:
+        """Get the library's time index, loading it from the library's `.data` directory if it 
+        isn't loaded yet (from the time index file, and then the changes in the time index log 
+        file). If the index is missing, or any entry files were added or removed since it was 
+        saved (the library directory's modification time changed), then it is rebuilt from all 
+        entries and saved again.
+
+        Because of this, write functions should get the time index *before* changing any entry 
+        files, and then call `save_time_index()` after."""
+        with self.mutex:
+            dir_mtime = self._get_dir_mtime()
+            if self.time_index is not None and self.time_index_dir_mtime == dir_mtime:
+                return self.time_index                      # the loaded index is still up to date
+            # 1) Try to load the saved index and apply its logged changes, if it's up to date:
+            saved_dir_mtime, log_size = None, 0
+            try:
+                with open(self.lib_path / _FILE_PATHS['time_index'], encoding='utf-8') as f:
+                    saved = json.load(f)
+                time_index = SortedIndex({title: time for time, title in saved['entries']})
+                saved_dir_mtime = saved['dir_mtime']
+                with open(self.lib_path / _FILE_PATHS['time_index_log'], encoding='utf-8') as f:
+                    for line in f:
+                        record = json.loads(line)
+                        for title, time in record['changes']:
+                            if time is None:
+                                time_index.remove(title)
+                            else:
+                                time_index.add(title, time)
+                        saved_dir_mtime = record['dir_mtime']
+                        log_size += 1
+            except FileNotFoundError:
+                pass                                        # (there's no time index file, or no changes were logged since it was saved)
+            except (ValueError, KeyError, TypeError):
+                saved_dir_mtime = None                      # (a file is corrupted, or the last record was only partly written)
+            if saved_dir_mtime == dir_mtime:
+                self.time_index = time_index
+                self.time_index_dir_mtime = dir_mtime
+                self.time_index_changes = []
+                self.time_index_log_size = log_size
+            # 2) Otherwise rebuild it from all entries (reading any which aren't cached yet), and save it:
+            else:
+                self.time_index = None
+                self.refresh()
+                self.time_index = self._build_sorted_index('time')
+                self.time_index_changes = []
+                self.save_time_index(compact=True)
+            return self.time_index
+
+    def save_time_index(self, compact:bool=False):
+        """Save the changes to the time index (if loaded) since it was last saved, along with 
+        the current modification time of the library directory, by appending them to the time 
+        index log file. Once the log has enough records (or if `compact` is True), the whole 
+        index is saved to the time index file instead, and the log is emptied - this way each 
+        write only takes as long as its own changes, rather than the size of the library."""
+        if self.time_index is None:
+            return
+        with metrics.span("save_time_index"):
+            self.time_index_dir_mtime = self._get_dir_mtime()
+            log_path = self.lib_path / _FILE_PATHS['time_index_log']
+            if compact or self.time_index_log_size >= max(_TIME_INDEX_LOG_MIN, len(self.time_index)):
+                log_path.unlink(missing_ok=True)            # (removed first, so that old logged changes can never be applied to the new time index file)
+                saved = {
+                    'dir_mtime': self.time_index_dir_mtime,
+                    'entries': [[time, title] for time, title in self.time_index.keys]
+                }
+                _write_file_atomically(self.lib_path / _FILE_PATHS['time_index'], json.dumps(saved))
+                self.time_index_log_size = 0
+            else:
+                record = {'dir_mtime': self.time_index_dir_mtime, 'changes': self.time_index_changes}
+                with open(log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")     # (if this is only partly written, then the saved index is rebuilt next time it's loaded)
+                self.time_index_log_size += 1
+            self.time_index_changes = []
+
+    def get_title_index(self) -> TitleIndex:
+        """Get the library's title index, building it from the names of all entry files if it 
+        isn't built yet. Cached entries which are added or removed also update the title index, 
+        but it is built again whenever any other entry files were added or removed since it was 
+        built (the library directory's modification time changed) - unless the watcher is keeping 
+        the cache up to date, in which case every change is made to the cache as it happens."""
+        with self.mutex:
+            if self.title_index is not None and self.watcher_synced and self.watcher.is_alive():
+                return self.title_index
+            dir_mtime = self._get_dir_mtime()
+            if self.title_index is None or self.title_index_dir_mtime != dir_mtime:
+                with metrics.span("list_titles"):
+                    self.title_index = TitleIndex(_get_entry_title_from_filepath(filename) for filename, _ in _iter_entry_files(self.lib_path, self.layout, signatures=False))
+                self.title_index_dir_mtime = dir_mtime
+            return self.title_index
+
+    def get_snapshot(self) -> dict:
+        """Get all parsed entries (and their content, if loaded) as a dict of plain data, to be 
+        saved in a snapshot as JSON. Entries with any front-matter values which JSON can't hold 
+        exactly (such as dates) are left out, so they will just be read again from their files."""
+        entries = [
+            [title, list(self.signatures[title]), entry, self.content_offsets[title]]
+            for title, entry in self.entries.items() if _is_plain_data(entry)
+        ]
+        return {
+            'entries': entries,
+            'contents': {title: self.contents[title] for title, _, _, _ in entries if title in self.contents},
+            'text_index': self.text_index is not None
+        }
+
+    def restore_snapshot(self, snapshot:dict):
+        """Fill the (empty) cache with the parsed entries from a snapshot (see `get_snapshot()`), 
+        rebuilding the text index from them if it was enabled. These are NOT checked against the 
+        entry files - the cache must be refreshed after this. Will raise an error (without changing 
+        the cache) if the snapshot data isn't valid."""
+        entries = []
+        for title, signature, entry, content_offset in snapshot['entries']:
+            assert isinstance(title, str) and isinstance(entry, dict) and entry.get('title') == title, "invalid snapshot entry"
+            assert len(signature) == 3 and all(isinstance(x, int) for x in signature), "invalid snapshot entry signature"
+            assert content_offset is None or isinstance(content_offset, int), "invalid snapshot entry content offset"
+            entries.append((title, tuple(signature), entry, content_offset))
+        contents = snapshot['contents']
+        assert isinstance(contents, dict) and all(isinstance(content, str) for content in contents.values()), "invalid snapshot contents"
+        for title, signature, entry, content_offset in entries:
+            self.positions[title] = self._next_position
+            self._next_position += 1
+            self.entries[title] = entry
+            self.signatures[title] = signature
+            self.content_offsets[title] = content_offset
+        self.contents = {title: content for title, content in contents.items() if title in self.entries}
+        if snapshot['text_index'] and len(self.contents) == len(self.entries):
+            self.text_index = TextIndex()
+            for title, entry in self.entries.items():
+                self.text_index.add(self._join_content(entry, self.contents[title]))
+        self._record_change()
+
+    def get_changes(self, since:int) -> list[tuple]|None:
+        """Get the (generation, title, action) of every change after the `since` generation, 
+        from oldest to newest. Returns None if the change log doesn't go back that far."""
+        with self.mutex:
+            if since < self.changes_start or since > self.generation:
+                return None
+            start = len(self.changes) - (self.generation - since)   # (there is one change for each generation in the change log)
+            return list(self.changes)[start:]
+
+    def get_result(self, key:tuple) -> list[dict]|None:
+        """Get a list of entries from the result cache (or None if `key` isn't in it)."""
+        with self.mutex:
+            result = self.results.get(key)
+            if result is None:
+                self.stats['result_misses'] += 1
+                return None
+            self.stats['result_hits'] += 1
+            self.results.move_to_end(key)
+            return result
+
+    def set_result(self, key:tuple, result:list[dict]):
+        """Add a list of entries to the result cache, removing the least recently used result 
+        if the cache is full. `key` should include the generation that the result was found at."""
+        with self.mutex:
+            self.results[key] = result
+            if len(self.results) > _RESULT_CACHE_SIZE:
+                self.results.popitem(last=False)
+
+    def enable_text_index(self):
+        """Build a text index from all currently cached entries, and keep it up to date from now on."""
+        if self.text_index is None:
+            text_index = TextIndex()
+            for entry in list(self.entries.values()):
+                text_index.add(self.with_content(entry))    # (this loads the content of all entries, which will then be kept)
+            self.text_index = text_index
+
+    def _build_sorted_index(self, prop_name:str) -> SortedIndex:
+        """Create a sorted index for all cached entries which have a number value for `prop_name`."""
+        return SortedIndex({title: entry[prop_name] for title, entry in self.entries.items() if _is_number(entry.get(prop_name))})
+
+    def get_number_index(self, prop_name:str) -> SortedIndex:
+        """Get the sorted index for the number values of a property, building it from all cached 
+        entries the first time (it will then be kept up to date)."""
+        if prop_name not in self.number_indexes:
+            self.number_indexes[prop_name] = self._build_sorted_index(prop_name)
+        return self.number_indexes[prop_name]
+
+    def get_search_candidates(self, query:'CompiledQuery') -> list[dict]|None:
+        """Use the text index and number indexes to get all cached entries which could possibly 
+        match a compiled query, in the same order as the cache. Any entry not included can't have 
+        a match score above 0 for any pattern. Returns None if the query has any text tokens but 
+        the text index isn't enabled."""
+        with self.mutex:
+            candidates = set()
+            for prop_name, matcher in query.matchers.items():
+                if matcher.required:
+                    # if there are any required tokens, then only entries with text values which contain all of them can match:
+                    if self.text_index is None:
+                        return None
+                    prop_candidates = self.text_index.get_candidates(prop_name, matcher.required[0])
+                    for tok in matcher.required[1:]:
+                        prop_candidates = prop_candidates & self.text_index.get_candidates(prop_name, tok)
+                    candidates |= prop_candidates
+                    continue
+                # otherwise, entries with text values which contain any of the optional tokens can match:
+                # (exclusion tokens can only make a match score 0, so they never add candidates)
+                if matcher.optional:
+                    if self.text_index is None:
+                        return None
+                    for tok in matcher.optional:
+                        candidates |= self.text_index.get_candidates(prop_name, tok)
+                # and entries with number values within any of the number ranges can match:
+                for low, high in matcher.number_ranges:
+                    candidates.update(self.get_number_index(prop_name).get_range(low, high))
+            return [self.entries[title] for title in sorted(candidates, key=self.positions.__getitem__)]
+
+def _get_entry_cache(lib_dir:str) -> _EntryCache:
+    """Get the entry cache for a library, creating a new (empty) one if it doesn't exist yet."""
+    lib_path = Path(lib_dir).resolve()
+    cache = _entry_caches.get(lib_path)
+    if cache is None:
+        with _entry_caches_lock:
+            cache = _entry_caches.get(lib_path)
+            if cache is None:
+                cache = _entry_caches[lib_path] = _EntryCache(lib_path)
+    return cache
+
+def _read_locked(func):
+    """A decorator for library functions (whose first argument is `lib_dir`) which only read 
+    entries, which makes them hold the library's entry cache lock for reading while running 
+    (so any number of them can run at the same time)."""
+    @wraps(func)
+    def wrapper(lib_dir, *args, **kwargs):
+        with _get_entry_cache(lib_dir).lock.read():
+            return func(lib_dir, *args, **kwargs)
+    return wrapper
+
+def _write_locked(func):
+    """A decorator for library functions (whose first argument is `lib_dir`) which change 
+    entries, which makes them hold the library's entry cache lock for writing while running 
+    (so no other library function can run at the same time)."""
+    @wraps(func)
+    def wrapper(lib_dir, *args, **kwargs):
+        with _get_entry_cache(lib_dir).lock.write():
+            return func(lib_dir, *args, **kwargs)
+    return wrapper
+
+def _read_entry_files(lib_path:Path, filenames:list[str], include_content:bool) -> list[tuple]:
+    """Read a chunk of entry files in a library (this is run in worker processes by 
+    `warm_up_library()`). Returns a list with a tuple of (filename, signature, front-matter 
+    properties, content, content offset) for each file which still exists."""
+    parsed_entries = []
+    for filename in filenames:
+        path = lib_path / filename
+        try:
+            signature = _EntryCache._get_signature(path.stat())     # (get this before reading the file, so that any changes made while reading it are never missed)
+            metadata, content, content_offset = _read_entry_file(path, include_content)
+        except FileNotFoundError:
+            continue
+        parsed_entries.append((filename, signature, metadata, content, content_offset))
+    return parsed_entries
+
+def _is_number(value) -> bool:
+    """Check if an entry property value is a number (int or float)."""
+    return isinstance(value, (int, float))
+
+def _is_plain_data(value) -> bool:
+    """Check whether a front-matter value is made of only JSON types (strings, numbers, booleans, 
+    None, lists, and dicts with string keys), so that it's exactly the same after a JSON round trip."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return True
+    if isinstance(value, list):
+        return all(_is_plain_data(x) for x in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and _is_plain_data(x) for key, x in value.items())
+    return False
+
+def _open_temp_file(dir_path:Path) -> tuple[int, Path]:
+    """Create a new temporary file in a directory, and return its open file descriptor (for 
+    writing bytes) and its path. Its name is short and random (and never an existing file's), 
+    so that a temporary file can be made for any file which fits in the directory, and no other 
+    file is ever replaced. Like `tempfile.mkstemp()`, but the file gets the same permissions as 
+    any new file (so the file it's renamed to does too)."""
+    while True:
+        temp_path = dir_path / f".{os.urandom(6).hex()}.tmp"   # (this isn't an entry file, as it doesn't end with ".md")
+        try:
+            return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666), temp_path
+        except FileExistsError:
+            continue
+
+def _write_file_atomically(filepath:Path, data:str|bytes):
+    """Write data to a file by first writing it to a temporary file in the same directory, and 
+    then renaming it to replace the file. This way the file is never left partially written."""
+    fd, temp_filepath = _open_temp_file(filepath.parent)
+    try:
+        with open(fd, 'w' if isinstance(data, str) else 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())                            # (make sure the data is actually on disk before the file is replaced)
+        os.replace(temp_filepath, filepath)
+    except BaseException:
+        temp_filepath.unlink(missing_ok=True)
+        raise
+
+def _write_entry_file(filepath:Path, content:str, metadata:dict) -> tuple:
+    """Write an entry file with its properties as YAML front-matter (in the same format as 
+    `frontmatter.dump()`), and return the signature of the written file. The file is written 
+    to a temporary file first, and then renamed to replace the entry file, so that it can never 
+    be read while partially written (by this app, or anything else). This is done with a single 
+    open, write, stat, close, and rename, so that many entries can be written quickly."""
+    with metrics.span("serialize"):
+        data = frontmatter.dumps(frontmatter.Post(content, **metadata), Dumper=_YAML_DUMPER).encode('utf-8')
+    with metrics.span("write_file"):
+        fd, temp_filepath = _open_temp_file(filepath.parent)
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]        # (a single write almost always writes everything, but isn't guaranteed to)
+                signature = _EntryCache._get_signature(os.fstat(fd))    # (renaming the file doesn't change its signature)
+            finally:
+                os.close(fd)
+            os.replace(temp_filepath, filepath)
+        except BaseException:
+            temp_filepath.unlink(missing_ok=True)
+            raise
+    return signature
+
+def _make_entry(title:str, content:str, metadata:dict) -> dict:
+    """Create an entry dict matching what would be read back from an entry file written 
+    with these values (front-matter keys are sorted, and content has its line endings 
+    normalized and is stripped, when dumped/loaded)."""
+    return dict({'title':title, 'content':_normalize_content(content)}, **dict(sorted(metadata.items())))
+
 ### Support For Search Operations ###
 
 def _tokenize(pattern:str) -> list[str]:
@@ -147,8 +974,9 @@ def _tokenize(pattern:str) -> list[str]:
         tokens.add(tok.lower())                             # finally check if there's any remaining tokens, and add them tokens list
     return list(tokens)                                     # convert tokens set to list, and then return
 
-def _get_pattern_value_matches(pattern:str, value:str|int|float) -> int:
-    """Get the number of times a value matches a pattern.
+class _PatternMatcher:
+    """A compiled version of a single pattern string, which can be used to get the number of 
+    times any value matches the pattern, without having to parse the pattern again each time.
 
     The search pattern syntax is relatively simple and follows these rules:
     - for strings, character case doesn't matter (everything becomes lowercase for consistency)
@@ -173,62 +1001,279 @@ def _get_pattern_value_matches(pattern:str, value:str|int|float) -> int:
     the character after it.
         - ex: `/*hi* there` will become `["*hi*", "there"]`, and the initial `*` will be ignored
         - and `//nhey` will become `/nhey` - allowing a `/` to stay
+    - lists are matched as a single string, with their items joined by `, `. Tokens are only
+    matched against strings (and lists), and number patterns are only matched against numbers.
     """
-    # 1) split the pattern string into tokens, according to whitespace and quotes
-    ptrn_tokens = _tokenize(pattern)
-    ptrn_matches = 0                                        # the number of times the value contained/matched a token in the pattern
-    if isinstance(value, str):
-        value = value.lower()                               # if the value is a string, make sure its entirely lowercase
-    for tok in ptrn_tokens:
-        # Exclusion Prefix:
-        if tok.startswith('!') and tok[1:] in value:
-            return 0                                        # if the the pattern token starts with the exclusion prefix, and the value contains this token, return 0 (value contains pattern which must NOT be present)
-        # Inclusion Prefix:
-        elif tok.startswith('*'):                           # if the the pattern token starts with the inclusion prefix, 
-            if tok[1:] in value:
-                ptrn_matches += 1                           # and the value contains this token, then increment the number of pattern matches
+
+    # The syntax for a number range (two numbers separated by a `-`, where each may be negative or a decimal):
+    _RANGE_SYNTAX = re.compile(r'(-?\d+(?:\.\d*)?)-(-?\d+(?:\.\d*)?)')
+
+    def __init__(self, pattern:str):
+        self.required = []                                  # the tokens which a value MUST contain (`*` prefix)
+        self.excluded = []                                  # the tokens which a value must NOT contain (`!` prefix)
+        self.optional = []                                  # the tokens which a value may contain (no prefix, or `/`)
+        self.number_ranges = []                             # the (inclusive) ranges that a number value may be within (`#` prefix) - each as a tuple of (low, high)
+        # Split the pattern string into tokens according to whitespace and quotes, and sort each token by its prefix:
+        for tok in _tokenize(pattern):
+            if tok.startswith('!'):
+                self.excluded.append(tok[1:])
+            elif tok.startswith('*'):
+                self.required.append(tok[1:])
+            elif tok.startswith('#'):
+                number_range = self._parse_number_pattern(tok[1:])
+                if number_range:
+                    self.number_ranges.append(number_range) # (a number pattern with the wrong syntax is ignored)
+            elif tok.startswith('/'):
+                self.optional.append(tok[1:])               # remove any starting slashes from token
             else:
-                return 0                                    # otherwise if the value does not contain this token, return 0 (value doesn't contain pattern which MUST be present)
-        # Number Prefix:
-        elif tok.startswith('#'):
-            if not isinstance(value, (int, float)):
-                continue                                    # if the pattern specifies value to match number(s), and the value is not a number (int or float type), then continue to next token (value is incorrect type)
-            n_ptrn = tok[1:]                                # remove the `#` prefix from pattern token to isolate the number matching syntax
-            # if `-` is in pattern, treat it as number range check:
-            if '-' in n_ptrn:
-                try:                                        # convert each number character in pattern to list of floats
-                    n = (float(x) for x in n_ptrn.split('-'))
-                except:
-                    continue                                # if conversion fails, continue to next token (wrong syntax was used)
-                if value > n[0] and value < n[1]:
-                    ptrn_matches += 1                       # if the value is within the range specified by the pattern, increment the number of pattern matches
-            # if the pattern contains `>` or `<`, then treat it as a great-than/less-than check:
-            elif ('>' in n_ptrn) or ('<' in n_ptrn):
-                n = n_ptrn[1]                               # isolate the number to check value against
-                try:
-                    n = float(n)                            # convert number to float
-                except:
-                    continue                                # if conversion fails, continue to next token (wrong syntax was used)
-                if '>' in n_ptrn and value > n:
-                    ptrn_matches += 1                       # if `>`, increment the number of pattern matches if value is greater-than the number to check against
-                elif '<' in n_ptrn and value < n:
-                    ptrn_matches += 1                       # if `<`, increment the number of pattern matches if value is less-than the number to check against
+                self.optional.append(tok)
+
+    @classmethod
+    def _parse_number_pattern(cls, n_ptrn:str) -> tuple[float, float]|None:
+        """Convert the number matching syntax of a `#` token (without the `#`) into an inclusive 
+        range of (low, high). Returns None if the syntax is wrong."""
+        try:
+            # if the pattern is two numbers separated by `-`, then treat it as number range:
+            if range_match := cls._RANGE_SYNTAX.fullmatch(n_ptrn):
+                return (float(range_match[1]), float(range_match[2]))
+            # if the pattern starts with `>` or `<`, then treat it as a great-than/less-than check (with an exclusive bound):
+            elif n_ptrn.startswith('>'):
+                return (math.nextafter(float(n_ptrn[1:]), math.inf), math.inf)
+            elif n_ptrn.startswith('<'):
+                return (-math.inf, math.nextafter(float(n_ptrn[1:]), -math.inf))
             # otherwise, if just a single number:
+            n = float(n_ptrn)
+            return (n, n)
+        except ValueError:
+            return None
+
+    def get_matches(self, value) -> int:
+        """Get the number of times a value matches the pattern."""
+        text = get_text_value(value)
+        if text is not None:
+            for tok in self.excluded:
+                if tok in text:
+                    return 0                                # if the value contains a token which must NOT be present, return 0
+            for tok in self.required:
+                if tok not in text:
+                    return 0                                # if the value doesn't contain a token which MUST be present, return 0
+            return len(self.required) + sum(tok in text for tok in self.optional)
+        elif _is_number(value) and not self.required:
+            return sum(low <= value <= high for low, high in self.number_ranges)
+        return 0                                            # (a value which isn't text can never contain a required token)
+
+class CompiledQuery:
+    """A compiled version of a patterns dict (see `get_entries_by_patterns()`), which can be 
+    used to get the match score of any entry. Use `compile_patterns()` to create one."""
+
+    def __init__(self, patterns:dict):
+        self.matchers = {prop_name: _PatternMatcher(ptrn) for prop_name, ptrn in patterns.items()}
+        self.key = tuple(sorted(                            # a normalized form of the patterns (the same for any patterns with the same tokens, in any order)
+            (prop_name, tuple(sorted(m.required)), tuple(sorted(m.excluded)), tuple(sorted(m.optional)), tuple(sorted(m.number_ranges)))
+            for prop_name, m in self.matchers.items()
+        ))
+
+    def get_match_score(self, entry:dict, content:str=None) -> int:
+        """Get the match score of an entry - the total number of times that each of its 
+        property values matched the pattern for that property. If `entry` doesn't include its 
+        content, then it should be given as `content` (if the query has a content pattern)."""
+        match_score = 0
+        for prop_name, matcher in self.matchers.items():    # iterate through all property pattern matchers
+            if prop_name == 'content' and content is not None:
+                entry_prop_val = content
             else:
-                try:
-                    n = float(n)                            # convert number to float
-                except:
-                    continue                                # if conversion fails, continue to next token (wrong syntax was used)
-                if value == n:
-                    ptrn_matches += 1                       # increment the number of pattern matches if the value is equal to the number
-        # No Prefix (or `/`):
+                entry_prop_val = entry.get(prop_name)       # get the value of the entry's property matching the current pattern property name
+            if entry_prop_val:                              # (if the the entry does not have this property, then it's skipped)
+                match_score += matcher.get_matches(entry_prop_val)
+        return match_score
+
+@lru_cache(maxsize=256)
+def _compile_patterns(pattern_items:tuple) -> CompiledQuery:
+    return CompiledQuery(dict(pattern_items))
+
+def compile_patterns(patterns:dict) -> CompiledQuery:
+    """Compile a patterns dict into a reusable `CompiledQuery` object. The most recently 
+    compiled patterns are cached, so repeating the same search doesn't compile them again."""
+    return _compile_patterns(tuple(sorted(patterns.items())))
+
+### Support For Sorting Entries ###
+
+class _Descending:
+    """A wrapper for a sort key value, which makes it sort in the reverse order (for values 
+    which can't simply be negated, like strings)."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        if not isinstance(other, _Descending):
+            return NotImplemented
+        return other.value < self.value
+
+    def __eq__(self, other):
+        if not isinstance(other, _Descending):
+            return NotImplemented
+        return self.value == other.value
+
+class _Last:
+    """A sort key value which is always greater than any other value (so it sorts last)."""
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return self is not other
+
+_LAST = _Last()
+
+def _sort_entries(entries:list[dict], match_scores:list[int], sort_props:list, n:int=None) -> list[dict]:
+    """Sort a list of entries by one or more properties in a single pass, and return at most 
+    `n` of them (see `get_entries_by_patterns()` for `sort_props`).
+
+    A single composite key is made for each entry, holding a part for each sort property in 
+    order of significance, with descending parts negated (or wrapped with `_Descending`). Entries 
+    which don't have a sort property are always sorted after the ones that do. If "MATCHSCORE" is 
+    a sort property, then `match_scores` should be a list of each entry's match score (in the same 
+    order as `entries`), or empty if there are none. If `n` is provided, then only the top `n` 
+    entries are selected with a heap, rather than sorting all of them. Entries with equal keys 
+    are sorted by title, so that the order never depends on the order of `entries` (which lets 
+    `get_entry_page()` find where a page ended with bisection)."""
+    # 1) Create a column of key parts for each sort property (for all entries):
+    key_columns = []
+    for prop, order in sort_props:
+        if prop == "MATCHSCORE":
+            values = match_scores or [None] * len(entries)
         else:
-            if tok.startswith('/'):
-                tok = tok[1:]                               # remove any starting slashes from token
-            if tok in value:
-                ptrn_matches += 1                           # simply, if the token is in the value, increment the number of pattern matches
+            values = [entry.get(prop) for entry in entries]
+        if order.upper() == 'DSC':
+            key_columns.append([_LAST if v is None else -v if isinstance(v, (int, float)) else _Descending(v) for v in values])
+        else:
+            key_columns.append([_LAST if v is None else v for v in values])
+    key_columns.append([entry['title'] for entry in entries])   # (titles are unique, so no two entries ever have equal keys)
+    # 2) Combine the columns into a composite key for each entry, followed by the entry's index (to get the entry back with):
+    keyed_indexes = zip(*key_columns, range(len(entries)))
+    # 3) Sort the entries by their keys (or select the top `n` of them):
+    if n:                                                   # if `n` provided, then get at most `n` number of sorted entries
+        keyed_indexes = heapq.nsmallest(n, keyed_indexes)
+    else:
+        keyed_indexes = sorted(keyed_indexes)
+    return [entries[keyed_index[-1]] for keyed_index in keyed_indexes]
+
+def _get_sort_key(values:list, sort_props:list, title:str) -> tuple:
+    """Get the composite sort key of a single entry (the same as the key `_sort_entries()` makes 
+    for it), from the values of its sort properties (in the same order as `sort_props`)."""
+    key = []
+    for value, (prop, order) in zip(values, sort_props):
+        if value is None:
+            key.append(_LAST)
+        elif order.upper() == 'DSC':
+            key.append(-value if isinstance(value, (int, float)) else _Descending(value))
+        else:
+            key.append(value)
+    key.append(title)
+    return tuple(key)
+
+### Support For Search Results ###
+
+def _find_entries(cache:_EntryCache, patterns:dict|CompiledQuery, sort_props:list, n:int=None) -> list[dict]:
+    """Get the sorted list of cached entries (without content) matching a search, as 
+    described in `get_entries_by_patterns()`. The entry dicts are the cache's own, so they 
+    must not be modified (and the list may be reused for the same search later)."""
+    matched_entries = []                                    # this will be the list which holds all matching entries from the database
+    entry_match_scores = []                                 # this will hold all the matched entry's match scores
     
-    return ptrn_matches                                     # finally, return the number of pattern matches
+    # 1) Get a list of all entry dicts from the library's entry cache (only entry files which changed since the last call will be read):
+    all_entries = cache.refresh()
+
+    # 2) If the same search was already done since the library last changed, then return its result again:
+    query = None
+    if patterns:
+        query = patterns if isinstance(patterns, CompiledQuery) else compile_patterns(patterns) # compile the patterns (unless they already are)
+    result_key = (query.key if query else None, tuple((prop, order.upper()) for prop, order in sort_props), n, cache.generation)
+    cached_result = cache.get_result(result_key)
+    if cached_result is not None:
+        return cached_result
+
+    # 3) Check each entry to see if its properties match any of the provided patterns:
+    if query:                                               # only continue if patterns were provided
+        with metrics.span("match"):
+            candidate_entries = cache.get_search_candidates(query)  # use the library's indexes to narrow down which entries need to be checked (if possible)
+            if candidate_entries is None:
+                candidate_entries = all_entries
+            needs_content = 'content' in query.matchers     # (entry content is only loaded if there's a pattern for it)
+            for entry in candidate_entries:                 # iterate through all (candidate) entries in database
+                content = cache.get_content(entry['title']) if needs_content else None
+                match_score = query.get_match_score(entry, content) # determine the match score for all patterns in the entry
+                # If this entry has at least one property matching the corresponding pattern,
+                # then add it to the list of matched entries and add its match score to the match score list:
+                if match_score:
+                    matched_entries.append(entry)           # append the entry dict to the list of matches
+                    entry_match_scores.append(match_score)
+        metrics.count_entries("scanned", len(candidate_entries))
+    else:
+        matched_entries = all_entries                       # if no patterns provided, then consider ALL entries as matched entries
+    metrics.count_entries("matched", len(matched_entries))
+
+    # 4) Sort the entries, and then keep and return them:
+    with metrics.span("sort"):
+        sorted_matched_entries = _sort_entries(matched_entries, entry_match_scores, sort_props, n)
+    cache.set_result(result_key, sorted_matched_entries)
+    return sorted_matched_entries
+
+def _get_sort_values(cache:_EntryCache, entry:dict, query:CompiledQuery|None, sort_props:list) -> list:
+    """Get the values of a cached entry's sort properties (in the same order as `sort_props`), 
+    getting its match score again if "MATCHSCORE" is one of them."""
+    values = []
+    for prop, order in sort_props:
+        if prop != "MATCHSCORE":
+            values.append(entry.get(prop))
+        elif query is None:
+            values.append(None)                             # (there are no match scores without patterns)
+        else:
+            content = cache.get_content(entry['title']) if 'content' in query.matchers else None
+            values.append(query.get_match_score(entry, content))
+    return values
+
+def _encode_cursor(offset:int, title:str, sort_values:list|None) -> str:
+    """Get an opaque cursor for a page of search results, which ended at `offset` with the entry 
+    `title`, whose sort property values were `sort_values` (None if they can't be stored as JSON)."""
+    return base64.urlsafe_b64encode(json.dumps([offset, title, sort_values]).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor:str) -> tuple[int, str, list|None]:
+    try:
+        offset, title, sort_values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        offset = title = sort_values = None
+    assert isinstance(offset, int) and offset >= 0 and isinstance(title, str) and (sort_values is None or isinstance(sort_values, list)), f'"{cursor}" is not a valid search cursor.'
+    return offset, title, sort_values
+
+def _find_page_end(cache:_EntryCache, entries:list[dict], query:CompiledQuery|None, sort_props:list, offset:int, last_title:str, last_values:list|None) -> int:
+    """Get the index in the sorted search results `entries` right after where the last entry of 
+    a previous page (`last_title`, with the sort property values `last_values`) is now, or would 
+    be if it was removed or changed. This is found by bisecting the results with the entry's 
+    sort key, so only the keys of a few entries are made. If the key can't be made, then the 
+    entry is looked for by title, and if it's not found, then `offset` is kept."""
+    if last_values is not None and len(last_values) == len(sort_props):
+        last_key = _get_sort_key(last_values, sort_props, last_title)
+        try:
+            return bisect_right(entries, last_key, key=lambda entry: _get_sort_key(_get_sort_values(cache, entry, query, sort_props), sort_props, entry['title']))
+        except TypeError:
+            pass                                            # (the stored values can't be compared with the current ones, such as if a property's type changed)
+    return next((i + 1 for i, entry in enumerate(entries) if entry['title'] == last_title), min(offset, len(entries)))
+
+def _project_entry(cache:_EntryCache, entry:dict, fields:list[str]|None, snippet_length:int) -> dict:
+    """Get a new dict with only the `fields` of a cached entry (see `iter_entries_by_title()`)."""
+    if fields is None:
+        return cache.with_content(entry)
+    projected = {'title': entry['title']}                   # (the title is always included, as it identifies the entry)
+    for field in fields:
+        if field == 'content':
+            projected['content'] = cache.get_content(entry['title'])
+        elif field == 'snippet':
+            projected['snippet'] = cache.get_snippet(entry['title'], snippet_length)
+        elif field in entry:
+            projected[field] = entry[field]
+    return projected
 
 ### Support For Library User File Operations ###
 
@@ -236,11 +1281,32 @@ def _get_valid_non_entry_path(lib_dir:str, path:str) -> Path:
     """Get a full absolute file path for a file in the library's non-entry directory.
     - `path` is the *relative* path for the file, including the file name, extension, 
     and any container directories.
+    
+    Will raise `PermissionError` if the path leads outside of the non-entry directory 
+    (such as with ".." parts, or through a symbolic link), so that no other library data 
+    files/dirs (or any files outside of the library) can ever be reached.
     """
     path_obj = Path(path)                                   # convert `path` string to Path objects
     if path_obj.is_absolute():
         path_obj = Path(*path_obj.parts[1:])                # if `path` is absolute (has root), make it relative (remove the root)
-    return lib_dir / _DIR_PATHS['non_entry'] / path_obj     # create and return a full absolute path by combining the library directory, non-entry dir, and the relative path for the file
+    non_entry_path = (Path(lib_dir) / _DIR_PATHS['non_entry']).resolve()
+    full_path = (non_entry_path / path_obj).resolve()       # create a full absolute path by combining the library directory, non-entry dir, and the relative path for the file (resolving any ".." parts and links)
+    if non_entry_path not in full_path.parents:
+        raise PermissionError(f"""The "{path}" non-entry file path leads outside of the library's non-entry folder.""")
+    return full_path
+
+def _write_chunks(f, data):
+    """Write data to an open binary file, in chunks if it's a file object or an iterable 
+    (see `write_non_entry_file()`)."""
+    if isinstance(data, str):
+        f.write(data.encode('utf-8'))
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        f.write(data)
+    elif hasattr(data, 'read'):
+        shutil.copyfileobj(data, f, _NON_ENTRY_CHUNK_SIZE)  # (a file object - copied a chunk at a time)
+    else:
+        for chunk in data:
+            f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
 
 
 ######################################################
@@ -249,6 +1315,7 @@ def _get_valid_non_entry_path(lib_dir:str, path:str) -> Path:
 
 ### Write Functions  - Create, Edit, Delete ###
 
+@_write_locked
 def create_entry(lib_dir:str, entry_data:dict):
     """Create a new entry in a library. `entry_data` must be dictionary which 
     includes all of the properties and their values that the entry should have 
@@ -257,12 +1324,18 @@ def create_entry(lib_dir:str, entry_data:dict):
     _validate_entry_data(entry_data)                        # ensure that the entry has valid properties 
     title = entry_data.pop('title')                         # remove and get the title and content from entry_data
     content = entry_data.pop('content')
+    cache = _get_entry_cache(lib_dir)
+    cache.get_time_index()                                  # make sure the library's time index is loaded before changing any files
     # 1) Create and validate a file path for the entry:
     entry_filepath = _get_entry_filepath(lib_dir, title)    # generate a file path (markdown file) for the entry from its title
     assert not entry_filepath.exists(), f'Cannot create new entry with the title "{title}". An entry already has this title.'
     # 2) Create a new file for the entry, including its properties as YAML front-matter:
-    frontmatter.dump(frontmatter.Post(content, **entry_data), entry_filepath)
+    signature = _write_entry_file(entry_filepath, content, entry_data)
+    # 3) Add the new entry to the library's entry cache (and time index):
+    cache.store(entry_filepath, _make_entry(title, content, entry_data), signature)
+    cache.save_time_index()
 
+@_write_locked
 def update_entry(lib_dir:str, title:str, new_entry_data:dict):
     """Overwrite an existing entry in a library.
     - `title`: the current title of the entry to edit.
@@ -271,6 +1344,8 @@ def update_entry(lib_dir:str, title:str, new_entry_data:dict):
     property value will be left as is. If a "title" property is included here, then it 
     will replace the current title for the entry."""
     # 1) Get the existing entry data and update it with the new data:
+    cache = _get_entry_cache(lib_dir)
+    cache.get_time_index()                                  # make sure the library's time index is loaded before changing any files
     entry_data = get_entry_by_title(lib_dir, title)         # get the existing entry
     entry_data.update(new_entry_data)                       # update the existing entry with the new entry data
     # 2) Validate and prepare the updated entry data:
@@ -278,29 +1353,154 @@ def update_entry(lib_dir:str, title:str, new_entry_data:dict):
     new_title = entry_data.pop('title')                     # remove and get the title and content from the updated entry_data
     content = entry_data.pop('content')
     entry_filepath = _get_entry_filepath(lib_dir, new_title)    # generate a file path (markdown file) for the entry from its title
-    # 3) If a new title was provided, then validate it and delete the old entry file:
+    # 3) If a new title was provided, then validate it:
     if title != new_title:
         assert not entry_filepath.exists(), f'Cannot update entry with the title "{new_title}". An entry already has this title.'
-        delete_entry(lib_dir, title)                        # delete the old file (only if the new title isn't already in use)
     # 4) Rewrite the file (or write a new file) for the entry, including its properties as YAML front-matter:
-    frontmatter.dump(frontmatter.Post(content, **entry_data), entry_filepath)
+    signature = _write_entry_file(entry_filepath, content, entry_data)
+    # 5) Update the entry in the library's entry cache (and time index), and delete the old entry file if it was renamed:
+    cache.store(entry_filepath, _make_entry(new_title, content, entry_data), signature)
+    if title != new_title:
+        with metrics.span("delete_file"):
+            _get_entry_filepath(lib_dir, title).unlink(missing_ok=True) # (only once the new file is written, so the entry can't be lost if writing it fails)
+        cache.discard(title)
+    cache.save_time_index()
 
+@_write_locked
 def delete_entry(lib_dir:str, title:str):
     """Delete the entry whose title is `title`. If entry doesn't exist, does nothing"""
+    cache = _get_entry_cache(lib_dir)
+    cache.get_time_index()                                  # make sure the library's time index is loaded before changing any files
     entry_filepath = _get_entry_filepath(lib_dir, title)    # generate a file path (markdown file) for the entry from its title
-    if entry_filepath.exists():
-        entry_filepath.unlink()                             # delete the entry file if it exists
+    with metrics.span("delete_file"):
+        if entry_filepath.exists():
+            entry_filepath.unlink()                         # delete the entry file if it exists
+    cache.discard(title)                                    # and remove it from the library's entry cache (and time index)
+    cache.save_time_index()
+
+@_write_locked
+def apply_batch(lib_dir:str, ops:list[dict]) -> list[dict]:
+    """Apply many create, update, and delete operations to a library's entries at once. 
+    Each operation is a dictionary with an "op" key, which must be one of:
+    - "create": with an "entry" key -> the entry data (same as for `create_entry()`)
+    - "update": with "title" and "entry" keys -> the current title of the entry, and the 
+    new entry data (same as for `update_entry()`)
+    - "delete": with a "title" key -> the title of the entry to delete (if the entry doesn't 
+    exist, does nothing)
+
+    All operations are validated first, in order (so each one can depend on the ones before 
+    it, such as updating an entry created earlier in the batch). Any invalid operations are 
+    skipped, without stopping the rest. Then the entry files are written, and the entry cache 
+    and time index are updated, all at once. Every new file is written before any old file is 
+    deleted, and the old file of a renamed entry is kept if its new file couldn't be written, 
+    so an entry is never lost because of a failed write.
+
+    Returns a list with a result for each operation - either `{'ok': True, 'title': <title>}` 
+    (with the entry's title after the operation), or `{'ok': False, 'error': <message>}`."""
+    cache = _get_entry_cache(lib_dir)
+    cache.get_time_index()                                  # make sure the library's time index is loaded before changing any files
+    pending = {}                                            # entry title -> (properties, content) of the entry after the batch, or None if it will be deleted
+    op_indexes = {}                                         # entry title -> the indexes of the operations which lead to the entry's state after the batch (which fail if its file can't be written or deleted)
+    moved_from = {}                                         # entry title -> the titles of the entries which were renamed to it (whose files are only deleted if its file is written)
+
+    def exists(title:str) -> bool:
+        if title in pending:
+            return pending[title] is not None
+        return _get_entry_filepath(lib_dir, title).exists()
+
+    def get_current(title:str) -> dict:
+        if title in pending:
+            metadata, content = pending[title]
+            return dict({'title':title, 'content':content}, **metadata)
+        return get_entry_by_title(lib_dir, title)
+
+    # 1) Validate each operation, and work out what every changed entry will be after the batch:
+    results = []
+    for i, op in enumerate(ops):
+        try:
+            assert isinstance(op, dict) and op.get('op') in ('create', 'update', 'delete'), f'invalid batch operation (must have an "op" of "create", "update", or "delete"):\n{op}'
+            if op['op'] in ('update', 'delete'):
+                assert isinstance(op.get('title'), str), f'the "{op["op"]}" batch operation must have a "title":\n{op}'
+            if op['op'] in ('create', 'update'):
+                assert isinstance(op.get('entry'), dict), f'the "{op["op"]}" batch operation must have an "entry" dictionary:\n{op}'
+            if op['op'] == 'create':
+                entry_data = dict(op['entry'])
+                _validate_entry_data(entry_data)
+                title = entry_data.pop('title')
+                assert not exists(title), f'Cannot create new entry with the title "{title}". An entry already has this title.'
+            elif op['op'] == 'update':
+                title = op['title']
+                assert exists(title), f"""Cannot get the entry with title "{title}". It doesn't exist in the library."""
+                entry_data = get_current(title)             # get the existing entry, and update it with the new entry data
+                entry_data.update(op['entry'])
+                _validate_entry_data(entry_data)
+                if entry_data['title'] != title:
+                    new_title = entry_data['title']
+                    assert not exists(new_title), f'Cannot update entry with the title "{new_title}". An entry already has this title.'
+                    pending[title] = None                   # the entry's old file will be deleted
+                    moved_from[new_title] = moved_from.pop(title, set()) | {title}
+                    op_indexes[new_title] = op_indexes.pop(title, [])
+                    op_indexes[title] = [i]
+                title = entry_data.pop('title')
+            else:
+                title = op['title']
+                pending[title] = None
+                op_indexes.setdefault(title, []).append(i)
+                results.append({'ok': True, 'title': title})
+                continue
+            content = entry_data.pop('content')
+            pending[title] = (entry_data, content)
+            op_indexes.setdefault(title, []).append(i)
+            results.append({'ok': True, 'title': title})
+        except (AssertionError, OSError, ValueError) as e:
+            results.append({'ok': False, 'error': str(e)})
+
+    def fail(title:str, error:Exception):
+        for i in op_indexes.get(title, ()):
+            results[i] = {'ok': False, 'error': f'Cannot write the entry with the title "{title}": {error}'}
+
+    # 2) Write the new entry files, and then delete the old ones, updating the entry cache as each file is done:
+    try:
+        kept = set()                                        # (the titles of entries whose files must not be deleted, as they were renamed to entries whose files couldn't be written)
+        for title, entry in pending.items():
+            if entry is None:
+                continue
+            metadata, content = entry
+            try:
+                entry_filepath = _get_entry_filepath(lib_dir, title)
+                signature = _write_entry_file(entry_filepath, content, metadata)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                fail(title, e)
+                kept.update(moved_from.get(title, ()))
+                continue
+            cache.store(entry_filepath, _make_entry(title, content, metadata), signature)
+        for title, entry in pending.items():
+            if entry is not None or title in kept:
+                continue
+            try:
+                with metrics.span("delete_file"):
+                    _get_entry_filepath(lib_dir, title).unlink(missing_ok=True)
+            except (OSError, ValueError) as e:
+                fail(title, e)
+                continue
+            cache.discard(title)
+    finally:
+        cache.save_time_index()                             # 3) save the updated time index once (even if writing some file failed)
+    return results
 
 ### Read Functions ###
 
+@_read_locked
 def get_entry_by_title(lib_dir:str, title:str) -> dict:
     """Get a single entry with the title `title`."""
-    entry_filepath = _get_entry_filepath(lib_dir, title)    # generate a file path (markdown file) for the entry from its title
-    assert entry_filepath.exists(), f"""Cannot get the entry with title "{title}". It doesn't exist in the library."""
-    post = frontmatter.load(entry_filepath)                 # read the entry file 
-    return dict({'title':title, 'content':post.content}, **post.metadata)
-        # ^ and return an entry dict containing all properties, including title and content
+    cache = _get_entry_cache(lib_dir)
+    try:
+        entry = cache.get(title)                            # get the entry from the library's entry cache (which will read the entry file if needed)
+    except FileNotFoundError:
+        raise AssertionError(f"""Cannot get the entry with title "{title}". It doesn't exist in the library.""") from None
+    return cache.with_content(entry)                        # return a new entry dict which includes content (so that the cached entry can't be modified)
 
+@_read_locked
 def get_entries_by_title(lib_dir:str, titles:list[str]) -> list[dict]:
     """Get all entries whose title's match those in the `titles` list arg."""
     entries = []
@@ -308,7 +1508,8 @@ def get_entries_by_title(lib_dir:str, titles:list[str]) -> list[dict]:
         entries.append(get_entry_by_title(lib_dir, title))  # and append an entry dict matching each title to the list of entries
     return entries
 
-def get_entries_by_patterns(lib_dir:str, patterns:dict=None, sort_props:list=[('title', 'ASC')], n:int=None) -> list[dict]:
+@_read_locked
+def get_entries_by_patterns(lib_dir:str, patterns:dict|CompiledQuery=None, sort_props:list=[('title', 'ASC')], n:int=None) -> list[dict]:
     """Get a list containing all entries within a library (`lib_dir`) whose properties match a search pattern string. 
     Can also sort those entries by one or more properties, with individual direction for each.
 
@@ -316,7 +1517,8 @@ def get_entries_by_patterns(lib_dir:str, patterns:dict=None, sort_props:list=[('
     - `lib_dir` - The path to the library to get entries from.
     - `patterns` - A dictionary where the keys are entry property names, and the values are pattern strings for the property values to match.
         - If not provided (None), then all entries will be matched and only the sorting mechanic will be applied.
-        - For a description of the of how match patterns work, see the docstring for the `_does_pattern_match_value()` function in this same module.
+        - For a description of the of how match patterns work, see the docstring for the `_PatternMatcher` class in this same module.
+        - This can also be a `CompiledQuery` from `compile_patterns()`, so that the same patterns can be reused without compiling them again.
     - `sort_props` - A list of tuples, where each tuple has an entry property name to use for sorting, and a string to specify sorting direction.
         - Sorting direction strings can be either: "ASC" for ascending, or "DSC" for descending. 
         - Multiple tuples can be within this list, where the first tuple is the most significant sorting rule, and the last is the least significant.
@@ -330,85 +1532,462 @@ def get_entries_by_patterns(lib_dir:str, patterns:dict=None, sort_props:list=[('
     titles in alphabetical order if time is the same, you could use: 
         - `patterns = {'title': "hello"}, sort_props = [('time', 'DSC')], n = 50`
     """
-    matched_entries = []                                    # this will be the list which holds all matching entries from the database
-    entry_match_scores = []                                 # this will hold all the matched entry's match scores
+    cache = _get_entry_cache(lib_dir)
+    sorted_matched_entries = _find_entries(cache, patterns, sort_props, n)
+    metrics.count_entries("returned", len(sorted_matched_entries))
+    with metrics.span("content"):
+        return [cache.with_content(entry) for entry in sorted_matched_entries]  # return new entry dicts which include content (so that the cached entries can't be modified)
+
+@_read_locked
+def get_entry_page(lib_dir:str, patterns:dict|CompiledQuery=None, sort_props:list=[('title', 'ASC')], limit:int=None, cursor:str=None) -> tuple[list[str], str|None]:
+    """Get one page of the titles of the entries matching a search (see `get_entries_by_patterns()`
+    for `patterns` and `sort_props`), along with the cursor to get the next page with (or None if
+    this is the last page). The entries themselves can then be gotten with `iter_entries_by_title()`.
+    - `limit` (optional) - the maximum number of titles in the page (if not provided, then all
+    of the remaining titles are in the page).
+    - `cursor` (optional) - the cursor returned with the previous page (if not provided, then
+    this is the first page).
+
+    If the library changed since the previous page, then the next page still starts right after
+    where the last entry of the previous page is in the sort order (even if that entry was since 
+    removed, or no longer matches the search), so no entries are repeated or skipped because of 
+    entries added or removed before it.
+    """
+    assert limit is None or (isinstance(limit, int) and limit > 0), f"The page limit must be a positive integer, not {limit}."
+    cache = _get_entry_cache(lib_dir)
+    offset, last_title, last_values = _decode_cursor(cursor) if cursor else (0, None, None)
+    query = None
+    if patterns:
+        query = patterns if isinstance(patterns, CompiledQuery) else compile_patterns(patterns) # (needed to get match scores again, for the cursors)
+    # 1) Get the sorted matching entries, only sorting as many as are needed for this page (and to know if there's another one after it):
+    entries = _find_entries(cache, patterns, sort_props, offset + limit + 1 if limit else None)
+    # 2) If the library changed since the previous page, then find where the last entry of the previous page is now:
+    if last_title is not None and not (0 < offset <= len(entries) and entries[offset-1]['title'] == last_title):
+        entries = _find_entries(cache, patterns, sort_props)
+        offset = _find_page_end(cache, entries, query, sort_props, offset, last_title, last_values)
+    # 3) Get the page, and the cursor for the next one:
+    page = entries[offset:offset+limit] if limit else entries[offset:]
+    end = offset + len(page)
+    next_cursor = None
+    if page and end < len(entries):
+        last_values = _get_sort_values(cache, page[-1], query, sort_props)
+        next_cursor = _encode_cursor(end, page[-1]['title'], last_values if _is_plain_data(last_values) else None)
+    return [entry['title'] for entry in page], next_cursor
+
+def iter_entries_by_title(lib_dir:str, titles:list[str], fields:list[str]=None, snippet_length:int=_SNIPPET_LENGTH, chunk_size:int=100):
+    """Get the entries whose titles are in `titles` one at a time (as a generator), skipping any
+    which no longer exist. Only `chunk_size` entries are gotten at a time (holding the library's
+    read lock while doing so), so that entries can be sent out as they are gotten, without
+    keeping all of them in memory, or keeping other threads from changing the library for long.
+    - `fields` (optional) - the names of the properties to include in each entry dict (the
+    title is always included). This can also include "snippet" - the first `snippet_length`
+    characters of the entry's content (followed by "…" if there's more), which only reads the
+    start of the content. If not provided, then all properties (including content) are included.
+    """
+    cache = _get_entry_cache(lib_dir)
+    for i in range(0, len(titles), chunk_size):
+        chunk = []
+        with cache.lock.read(), metrics.span("content"):
+            for title in titles[i:i+chunk_size]:
+                try:
+                    chunk.append(_project_entry(cache, cache.get(title), fields, snippet_length))
+                except FileNotFoundError:
+                    continue                                # (the entry was deleted since its title was gotten)
+        metrics.count_entries("returned", len(chunk))
+        yield from chunk
+
+@_read_locked
+def get_recent_entries(lib_dir:str, n:int, before:int|float|tuple=None) -> list[dict]:
+    """Get the `n` most recent entries in a library (sorted from most to least recent, and 
+    then by title), using the library's time index, so that only the files of those `n` 
+    entries are read.
+    - `before` (optional) - a (time, title) pair, to only get the entries after it in that 
+    order. This is used as a cursor to get the next `n` entries after a previous call, by 
+    passing the time and title of the last (oldest) entry that it returned - entries with 
+    the same time as it are never skipped. It can also be just a timestamp, to only get 
+    entries whose time is less than it.
+    """
+    cache = _get_entry_cache(lib_dir)
+    entries = []
+    with cache.mutex:
+        titles = cache.get_time_index().get_last(n, before)
+    for title in titles:
+        try:
+            entries.append(cache.with_content(cache.get(title)))    # get each entry from the entry cache (which will read the entry file if needed)
+        except FileNotFoundError:
+            continue                                        # (the entry file was deleted since the index was loaded - this will be picked up by the next call)
+    return entries
+
+@_read_locked
+def complete_title(lib_dir:str, prefix:str, n:int=10, max_typos:int=0) -> list[str]:
+    """Get up to `n` entry titles which start with `prefix` (ignoring case), in alphabetical 
+    order, using the library's title index (so no entry files are read).
+    - `max_typos` (optional) - also get titles whose start has up to this many characters 
+    inserted, deleted, or changed compared to `prefix`, sorted by how many (the closest first).
+    """
+    assert 0 <= max_typos <= _MAX_TITLE_TYPOS, f"`max_typos` must be between 0 and {_MAX_TITLE_TYPOS}"
+    cache = _get_entry_cache(lib_dir)
+    with cache.mutex:
+        title_index = cache.get_title_index()
+        if max_typos:
+            return title_index.get_fuzzy(prefix, n, max_typos)
+        return title_index.get_prefix(prefix, n)
+
+@_read_locked
+def get_generation(lib_dir:str) -> int:
+    """Get the generation of a library's entry cache - a number which is increased whenever 
+    any entry is added, changed, or removed (either by this module, or by anything else, once 
+    the change is found). If it's the same before and after getting some entries, then those 
+    entries are up to date with that generation."""
+    return _get_entry_cache(lib_dir).generation
+
+@_read_locked
+def get_synced_generation(lib_dir:str) -> int|None:
+    """Get the generation of a library's entry cache if the cache is kept up to date by a 
+    watcher (see `watch_library()`), so that it's already the generation which getting any 
+    entries would be up to date with (without needing to refresh the cache first). Otherwise 
+    this returns None."""
+    cache = _get_entry_cache(lib_dir)
+    if cache.watcher_synced and cache.watcher.is_alive():
+        return cache.generation
+    return None
+
+@_read_locked
+def get_changes(lib_dir:str, since:int|None) -> dict:
+    """Get the changes to a library's entries since the `since` generation (see `get_generation()`), 
+    first checking the library directory for any changes made outside of this module. Returns a 
+    dict with:
+    - `generation` - the current generation (to use as `since` to get the next changes)
+    - `changes` - a list with a dict for each entry which was changed, from least to most recently 
+    changed, with its `title`, the `action` ("created", "updated", or "deleted"), and the `entry` 
+    itself (including content) unless it was deleted. An entry which was created and then updated 
+    is still "created". This is None if the changes since `since` are no longer known (or `since` 
+    is from before the library was fully loaded) - in that case, all needed entries should be 
+    gotten again. If `since` is None, then only the current generation is needed, so this is 
+    always None.
+    """
+    cache = _get_entry_cache(lib_dir)
+    cache.refresh()
+    with cache.mutex:
+        generation = cache.generation
+        changes = None if since is None else cache.get_changes(since)
+    if changes is None:
+        return {'generation': generation, 'changes': None}
+    # Combine all of the changes for each entry into one:
+    actions = {}
+    for _, title, action in changes:
+        if actions.get(title) == "created" and action == "updated":
+            continue                                        # (the entry is still new to anyone who hasn't seen it yet)
+        actions.pop(title, None)                            # (re-add the entry, so that the entries stay in order of their last change)
+        actions[title] = action
+    entry_changes = []
+    for title, action in actions.items():
+        change = {'title': title, 'action': action}
+        if action != "deleted":
+            try:
+                change['entry'] = cache.with_content(cache.get(title))
+            except FileNotFoundError:
+                change['action'] = "deleted"                # (the entry file was deleted since the change)
+        entry_changes.append(change)
+    return {'generation': generation, 'changes': entry_changes}
+
+def wait_for_changes(lib_dir:str, since:int, timeout:float=None) -> dict:
+    """Wait until a library's entries change after the `since` generation (or until `timeout` 
+    seconds pass), and then get the changes with `get_changes()`. Changes made outside of this 
+    module are only found once the timeout passes, so it should be fairly short."""
+    cache = _get_entry_cache(lib_dir)
+    with cache.changed:
+        cache.changed.wait_for(lambda: cache.generation > since, timeout)
+    return get_changes(lib_dir, since)
+
+@_write_locked
+def watch_library(lib_dir:str, polling:bool=False, poll_interval:float=1.0) -> str:
+    """Start watching a library directory for changes to its entry files made outside of this 
+    module (by other editors, sync tools, etc.), and update the library's entry cache as they 
+    happen. The library is then scanned once more, after which it never needs to be scanned 
+    again, so searches are faster (but changes may take a moment to be seen - at most about 
+    1 second with inotify, and `poll_interval` seconds when polling).
+
+    On Linux, inotify is used to watch the directory, unless `polling` is True (or it's not 
+    available) - then the directory is scanned every `poll_interval` seconds instead.
+    Returns the watch method used ("inotify" or "polling"). If the library is already being 
+    watched, then this does nothing (and returns the method already used)."""
+    cache = _get_entry_cache(lib_dir)
+    if cache.watcher is not None and cache.watcher.is_alive():
+        return cache.watcher.method
+    def update(filenames:set[str], missed:bool):
+        with cache.lock.write():
+            try:
+                if missed:
+                    cache.watcher_synced = False            # (some changes may have been missed, so the whole library needs to be scanned again)
+                    cache.refresh()
+                else:
+                    cache.update_files(filenames)
+            except BaseException:
+                cache.watcher_synced = False                # (the changes may not all have been made to the cache, so the library is scanned again when it's next needed)
+                raise
+    subdirs = _SHARD_DIRS if cache.layout == "sharded" else ()
+    cache.watcher = DirectoryWatcher(cache.lib_path, update, suffix=".md", subdirs=subdirs, polling=polling, poll_interval=poll_interval)
+    cache.watcher_synced = False
+    cache.watcher.start()
+    cache.refresh()                                         # (any changes made while this runs will be found by the watcher too)
+    return cache.watcher.method
+
+def stop_watching_library(lib_dir:str):
+    """Stop watching a library directory (see `watch_library()`). The library directory will 
+    then be scanned again whenever all entries are needed."""
+    cache = _get_entry_cache(lib_dir)
+    with cache.mutex:
+        watcher = cache.watcher
+        cache.watcher = None
+        cache.watcher_synced = False
+    if watcher is not None:
+        watcher.stop()                                      # (this can't be done while holding the library's lock, as the watcher may be waiting for it)
+
+def migrate_library_layout(lib_dir:str, layout:str) -> int:
+    """Move all of a library's entry files into another layout (see `_LAYOUTS`) - "sharded", 
+    where they're spread across 256 shard directories (so that no directory gets too big for 
+    file systems and sync tools which are slow with huge directories), or back to "flat". The 
+    layout is then saved in the library's settings, so that it's used from then on. Returns the 
+    number of entry files which were moved.
+
+    Entry files are found in either layout, so if this is interrupted, then it can just be run 
+    again to finish. Moving a file doesn't change its signature, so no entries need to be read 
+    again. No other program should change the library's entry files while this runs."""
+    assert layout in _LAYOUTS, f'"{layout}" is not a library layout. It must be one of: {", ".join(_LAYOUTS)}'
+    cache = _get_entry_cache(lib_dir)
+    watching = cache.watcher is not None
+    stop_watching_library(lib_dir)                          # (if the library is watched, then it's watched again in the new layout at the end)
+    with cache.lock.write():
+        cache.get_time_index()                              # make sure the library's time index is loaded before changing any files
+        lib_path = cache.lib_path
+        # 1) Find every entry file (in either layout) which isn't where it should be in the new layout:
+        moves = []
+        for filename, _ in chain(_iter_entry_files(lib_path, "flat"), _iter_entry_files(lib_path, "sharded")):
+            filepath = lib_path / filename
+            new_filepath = _get_entry_filepath(lib_path, _get_entry_title_from_filepath(filename), layout)
+            if filepath != new_filepath:
+                moves.append((filepath, new_filepath))
+        conflicts = [str(new_filepath) for _, new_filepath in moves if new_filepath.exists()]
+        assert not conflicts, f"Cannot migrate the library's layout, as these entry files are in both layouts: {', '.join(conflicts[:10])}"
+        # 2) Move the files:
+        if layout == "sharded":
+            for shard_dir in _SHARD_DIRS:
+                (lib_path / shard_dir).mkdir(exist_ok=True)
+        for filepath, new_filepath in moves:
+            os.rename(filepath, new_filepath)
+        if layout == "flat":
+            for shard_dir in _SHARD_DIRS:
+                try:
+                    (lib_path / shard_dir).rmdir()
+                except OSError:
+                    continue                                # (the directory doesn't exist, or has other files in it)
+        # 3) Save the new layout, and use it from now on:
+        settings = _read_settings(lib_path)
+        settings['layout'] = layout
+        _write_file_atomically(lib_path / _FILE_PATHS['settings'], json.dumps(settings, indent=1))
+        _layouts.clear()                                    # (the layout is kept under every path the library was accessed by)
+        cache.layout = layout
+        # 4) Bring the entry cache and time index up to date with the moved files:
+        cache.refresh()
+        cache.save_time_index()
+    if watching:
+        watch_library(lib_dir)
+    return len(moves)
+
+@_write_locked
+def enable_text_index(lib_dir:str):
+    """Build an inverted text index for all entries in a library, which will be kept up to 
+    date and used to speed up `get_entries_by_patterns()` from then on (at the cost of the 
+    memory needed to hold it). Results are exactly the same with or without the index."""
+    cache = _get_entry_cache(lib_dir)
+    cache.refresh()
+    cache.enable_text_index()
+
+@_write_locked
+def save_snapshot(lib_dir:str):
+    """Save a snapshot of all parsed entries (and their loaded content) in a library's entry 
+    cache to a file in the library's `.data` directory, so that they can be loaded with 
+    `load_snapshot()` rather than reading every entry file again. The snapshot is only plain 
+    data (JSON after a small binary header), so loading one can never run any code, and if the 
+    text index is enabled it's rebuilt from the entries when loading. The file is written 
+    atomically, so a crash while saving can never leave a partially written snapshot."""
+    cache = _get_entry_cache(lib_dir)
+    data = json.dumps(cache.get_snapshot(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    header = _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, zlib.crc32(data), len(data))
+    _write_file_atomically(cache.lib_path / _FILE_PATHS['snapshot'], header + data)
+
+@_write_locked
+def load_snapshot(lib_dir:str) -> bool:
+    """Load the snapshot saved by `save_snapshot()` into a library's entry cache (which must be 
+    empty), and then refresh the cache, so that only the entry files which were added or changed 
+    since the snapshot was saved are read (and entries which were deleted are removed). 
     
-    # 1) Read all entry files and convert to list of entry dicts:
-    all_entries = []
-    for path in Path(lib_dir).iterdir():                    # iterate through each path in the top level of the library directory
-        if path.is_file() and (path.suffix == ".md"):       # if the path is a markdown file, then it can be considered an entry
-            post = frontmatter.load(path)                   # read the entry file,
-            title = _get_entry_title_from_filepath(path)    # get the title from file path
-            all_entries.append(dict({'title':title, 'content':post.content}, **post.metadata))
-                # ^ and append an entry dict containing all properties, including title and content, to the list of all entries 
-
-    # 2) Check each entry to see if its properties match any of the provided patterns:
-    if patterns:                                            # only continue if patterns were provided
-        for entry in all_entries:                           # iterate through all entries in database
-            match_score = 0
-            for prop_name, ptrn in patterns.items():        # iterate through all property patterns in `patterns`
-                entry_prop_val = entry.get(prop_name)       # get the value of the entry's property matching the current pattern property name
-                if not entry_prop_val:
-                    continue                                # if the the entry does not have this property, then skip this cycle and continue to check the next one
-                if isinstance(entry_prop_val, list):        # if the entry's property value is a list, convert it to a string first
-                    entry_prop_val = ', '.join(entry_prop_val)
-                match_score += _get_pattern_value_matches(ptrn, entry_prop_val) # determine match score for this pattern in the entry and add it `match_score` 
-            # If this entry has at least one property matching the corresponding pattern,
-            # then add it to the list of matched entries and add its match score to the match score list:
-            if match_score:
-                matched_entries.append(entry)               # append the entry dict to the list of matches
-                entry_match_scores.append(match_score)
-    else:
-        matched_entries = all_entries                       # if no patterns provided, then consider ALL entries as matched entries
+    Returns False (and does nothing) if there is no valid snapshot - if it's missing, was saved 
+    by a different snapshot format version, or is corrupted."""
+    cache = _get_entry_cache(lib_dir)
+    if cache.entries:
+        return False                                        # (a snapshot can't be merged with entries which are already cached)
+    # 1) Read the snapshot file, and validate its header and data:
+    try:
+        with open(cache.lib_path / _FILE_PATHS['snapshot'], 'rb') as f:
+            header = f.read(_SNAPSHOT_HEADER.size)
+            magic, version, checksum, length = _SNAPSHOT_HEADER.unpack(header)
+            data = f.read()
+    except (FileNotFoundError, struct.error):
+        return False
+    if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION or len(data) != length or zlib.crc32(data) != checksum:
+        return False
+    # 2) Restore the cache from the snapshot, and bring it up to date with the library directory:
+    try:
+        cache.restore_snapshot(json.loads(data))
+    except (ValueError, TypeError, KeyError, AssertionError):
+        return False
+    cache.refresh()
+    return True
+
+def warm_up_library(lib_dir:str, workers:int=None, chunk_size:int=500, text_index:bool=False, snapshot:bool=False, watch:bool=False, blocking:bool=False, progress=None) -> dict:
+    """Read all entry files in a library which aren't already cached, so that the first requests 
+    for entries don't have to. The files are split into chunks, which are read in parallel by a 
+    pool of worker processes and merged into the library's entry cache as they finish. Finally, 
+    the library's time index is loaded (or rebuilt if needed).
+
+    If `snapshot` is True, then the library's snapshot (see `save_snapshot()`) is loaded first, 
+    so that only the files which changed since it was saved need to be read, and a new snapshot 
+    is saved at the end.
 
-    # 3) Sort and then return the entries:
-    sorted_matched_entries = matched_entries.copy()         # create a copy of the matched entries to be sorted
-    for prop, order in reversed(sort_props):                # sort the matched entries by each sort property (need to start with last property first for this to be in correct order)
-        def key_func(entry):
-            # This sorting key function will return the specified entry sort property value to use for sorting.
-            # But if the sort property is not present in the entry, then it will instead return a value which
-            # is compatible its type and unobtrusive in affecting the sort order.
-            prop_type = _BASE_PROPERTIES.get(prop)          # get the property type from _BASE_PROPERTIES directly
-            if isinstance(prop_type, (tuple, list)):        
-                prop_type = prop_type[type(0)]              # or its a tuple/list of values, from the type of its first element
-            default_vals_by_type = {                        # adjust values so that this is always the *last* entry
-                int: float('-inf') if order.upper() == "DSC" else float('inf'),
-                str: '' if order.upper() == "DSC" else ('z'*100)
-            }
-            def_val = default_vals_by_type.get(prop_type)   # get the default value based on property type
-            return entry.get(prop, def_val)
-        if prop == "MATCHSCORE":                            # otherwise if the property is "MATCHSCORE", then the sorting function should return the match score for the item (same index between lists)
-            key_func = lambda entry: entry_match_scores[matched_entries.index(entry)]   # get the index of this entry in the matched_entries list, and use that index for getting its corresponding match score in entry_match_scores
-        rev = True if order.upper() == 'DSC' else False 
-        sorted_matched_entries.sort(key=key_func, reverse=rev)
-    if n:                                                   # if `n` provided, then return at most `n` number of sorted matched entries
-        return sorted_matched_entries[:n]                   # (even if n is larger than length of the list, no errors are raised)
-    return sorted_matched_entries                           # otherwise just return all
+    If `watch` is True, then the library is watched for outside changes from the end of the warm 
+    up onwards (see `watch_library()`), so it never needs to be scanned again.
+
+    This can be run in a separate thread while the library is being used (see `start_warm_up()`).
+    Other library functions can still be called while it runs - by default they continue as 
+    normal (reading any entries which haven't been merged yet themselves), but if `blocking` is 
+    True, then the library's lock is held (for writing) for the whole warm up, so they will wait until it's finished.
+
+    ### Arguments:
+    - `workers` - The number of worker processes to use (defaults to the number of CPUs). If 1, 
+    or if there are only enough files for a single chunk, then they are read in this process.
+    - `chunk_size` - The number of files that each worker reads at a time.
+    - `text_index` - If True, then the library's text index will be enabled first, and built 
+    from the entries as they are merged (this means that all entry content is read).
+    - `progress` - (optional) A function which will be called with the number of files read so 
+    far, and the total number of files to read, each time a chunk is merged.
+
+    Returns a dict with the number of `files` which were read, and the number of `seconds` it took.
+    """
+    cache = _get_entry_cache(lib_dir)
+    with cache.lock.write() if blocking else nullcontext():
+        start_time = perf_counter()
+        # 1) Find all entry files which aren't already cached (or have changed):
+        with cache.lock.write():
+            if snapshot and not cache.entries:
+                load_snapshot(lib_dir)
+            if text_index:
+                cache.enable_text_index()
+            include_content = cache.text_index is not None  # (content is only needed now if it will be indexed)
+            filenames = []
+            for filename, signature in _iter_entry_files(cache.lib_path, cache.layout):
+                if cache.signatures.get(_get_entry_title_from_filepath(filename)) != signature:
+                    filenames.append(filename)
+        chunks = [filenames[i:i+chunk_size] for i in range(0, len(filenames), chunk_size)]
+        # 2) Read each chunk of files (in parallel if possible), and merge them into the cache as they finish:
+        done = 0
+        def merge(parsed_entries:list[tuple], chunk:list[str]):
+            nonlocal done
+            with cache.lock.write():
+                cache.merge_parsed(parsed_entries)
+            done += len(chunk)
+            if progress:
+                progress(done, len(filenames))
+        if workers == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                merge(_read_entry_files(cache.lib_path, chunk, include_content), chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as executor:    # (use "spawn", as forking a process with multiple threads isn't safe)
+                futures = {executor.submit(_read_entry_files, cache.lib_path, chunk, include_content): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    merge(future.result(), futures[future])
+        # 3) Make sure the cache and time index are up to date (this only reads files which changed while warming up):
+        with cache.lock.write():
+            if watch:
+                watch_library(lib_dir)                      # (this refreshes the cache too)
+            else:
+                cache.refresh()
+            cache.get_time_index()
+            if snapshot:
+                save_snapshot(lib_dir)
+        return {'files': len(filenames), 'seconds': perf_counter() - start_time}
+
+def start_warm_up(lib_dir:str, **kwargs) -> Thread:
+    """Start warming up a library (see `warm_up_library()`) in a background thread, and return 
+    the thread. Any keyword arguments are passed on to `warm_up_library()`. In blocking mode, 
+    this only returns once the thread holds the library's lock, so that no other library 
+    function can run before the warm up."""
+    cache = _get_entry_cache(lib_dir)
+    started = Event()
+    def warm_up():
+        with cache.lock.write() if kwargs.get('blocking') else nullcontext():
+            started.set()
+            warm_up_library(lib_dir, **kwargs)
+    thread = Thread(target=warm_up, daemon=True)
+    thread.start()
+    started.wait()
+    return thread
+
+@_read_locked
+def get_entry_cache_stats(lib_dir:str) -> dict:
+    """Get the hit/miss/reload counters of a library's entry cache (and its result cache), 
+    along with the number of entries currently held in it, its generation, the method used to 
+    watch the library (None if the cache isn't kept up to date by a watcher), and the layout of 
+    the library's entry files."""
+    cache = _get_entry_cache(lib_dir)
+    watching = cache.watcher.method if cache.watcher_synced and cache.watcher.is_alive() else None
+    return dict(cache.stats, entries=len(cache.entries), generation=cache.generation, watching=watching, layout=cache.layout)
 
 
 #########################################################
 ######### Main Functions for Library User Files #########
 #########################################################
 
-def write_non_entry_file(lib_dir:str, path:str, data:str|bytes=""):
+def write_non_entry_file(lib_dir:str, path:str, data=""):
     """Create a new non-entry file in a library.
     - `path` is the *relative* path that the file should exist in the the library's 
     non-entry folder, including the file name, extension, and any container directories. 
     If the directories in this path do not exist, then they will be created.
         - Will raise error if it already exists as a file, or if it leads to any 
         protected library data files/dirs.
-    - `data` is the file data that will be written to the file. (defaults to empty string)
+    - `data` is the file data that will be written to the file (defaults to empty string). 
+    This can be a string (written as UTF-8 text), bytes, a binary file object (such as an 
+    uploaded file), or an iterable of strings/bytes - the last two are written a chunk at a 
+    time, so a large file never needs to be in memory all at once.
     """
     # 1) Prepare and validate path:
     full_path = _get_valid_non_entry_path(lib_dir, path)    # get a valid full absolute library path
     if full_path.is_file():
         raise FileExistsError(f"""The "{path}" non-entry file cannot be created. It already exists in this library.""")
     full_path.parent.mkdir(parents=True, exist_ok=True)     # if path had any directories between the file and the library directory, then this will create any which don't exist, and leave alone any which do
-    # 2) Create the file:
-    if isinstance(data, str):
-        full_path.write_text(data)                          # if the data is a string, then create file and write data as text
-    elif isinstance(data, bytes):
-        full_path.write_bytes(data)                         # or if the data is bytes, then create file and write data as bytes
+    # 2) Create the file (writing to a temporary file first, so that the file is never seen partially written):
+    fd, temp_path = _open_temp_file(full_path.parent)      # (never an existing file, so no other non-entry file can be replaced by it)
+    try:
+        with open(fd, 'wb') as f:
+            _write_chunks(f, data)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+def get_non_entry_file_path(lib_dir:str, path:str) -> Path:
+    """Get the full absolute path of an existing non-entry file in a library (such as to 
+    serve it straight from the file).
+    - `path` is the *relative* path where the file exists in the the library's 
+    non-entry folder.
+        - Will raise error if it doesn't exist as a file, or if it leads to any 
+        protected library data files/dirs.
+    """
+    full_path = _get_valid_non_entry_path(lib_dir, path)    # get a valid full absolute library path
+    if not full_path.is_file():
+        raise FileNotFoundError(f"""Cannot get the non-entry file "{path}". It doesn't exist in the library.""")
+    return full_path
 
 def read_non_entry_file(lib_dir:str, path:str, text:bool=True) -> str|bytes:
     """Get the contents of an existing non-entry file in a library.
@@ -416,16 +1995,50 @@ def read_non_entry_file(lib_dir:str, path:str, text:bool=True) -> str|bytes:
     non-entry folder.
         - Will raise error if it doesn't exist as a file, or if it leads to any 
         protected library data files/dirs.
-    - `text` is a boolean that if True (default), will read the file as text, or 
+    - `text` is a boolean that if True (default), will read the file as (UTF-8) text, or 
     if False, will read the file as bytes.
+
+    This reads the whole file into memory - for large files, use `iter_non_entry_file()` 
+    or `map_non_entry_file()` instead.
     """
-    full_path = _get_valid_non_entry_path(lib_dir, path)    # get a valid full absolute library path
-    if full_path.exists():
-        raise FileNotFoundError(f"""Cannot get the non-entry file "{path}". It doesn't exist in the library.""")
+    full_path = get_non_entry_file_path(lib_dir, path)
     if text:
-        return full_path.read_text()                        # read and return the file content as either text or bytes depending on `text` arg bool value
+        return full_path.read_text(encoding='utf-8')        # read and return the file content as either text or bytes depending on `text` arg bool value
     return full_path.read_bytes()
 
+def iter_non_entry_file(lib_dir:str, path:str, start:int=0, end:int=None, chunk_size:int=_NON_ENTRY_CHUNK_SIZE):
+    """Read an existing non-entry file in a library a chunk (of bytes) at a time (as a generator).
+    - `path` - see `read_non_entry_file()`.
+    - `start` and `end` (optional) - only read the bytes from `start` up to (but not 
+    including) `end`, rather than the whole file.
+    """
+    full_path = get_non_entry_file_path(lib_dir, path)
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        remaining = math.inf if end is None else end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@contextmanager
+def map_non_entry_file(lib_dir:str, path:str):
+    """Memory-map an existing non-entry file in a library for reading, within a `with` block 
+    (as a read-only `mmap`, which can be sliced like bytes). Only the parts of the file which 
+    are actually used are read (by the OS, as they're needed), so this is best for getting 
+    parts of large files. An empty file gives empty bytes instead (as it can't be mapped).
+    - `path` - see `read_non_entry_file()`.
+    """
+    full_path = get_non_entry_file_path(lib_dir, path)
+    with open(full_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
 def delete_non_entry_file(lib_dir:str, path:str):
     """Delete an existing non-entry file in a library.
     - `path` is the *relative* path where the file exists in the library's 
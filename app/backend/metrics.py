@@ -0,0 +1,174 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, local
+from time import perf_counter, time
+import heapq
+import random
+
+########################
+######### Data #########
+########################
+
+# The upper bounds (in seconds) of the histogram buckets for all timings:
+_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# All metrics -> metric name -> (metric type, help text):
+_METRICS = {
+    'edomode_request_seconds': ("histogram", "Time taken to handle each request (until the response starts), by endpoint."),
+    'edomode_requests_total': ("counter", "Number of requests handled, by endpoint and status code."),
+    'edomode_phase_seconds': ("histogram", "Time spent in each phase of the library's work (a phase within another is counted in both)."),
+    'edomode_entries_total': ("counter", "Number of entries scanned, matched, and returned by library searches."),
+}
+
+_lock = Lock()                                              # (held while changing any metric values)
+_histograms = {}                                            # (metric name, labels) -> [bucket counts (not cumulative) + the overflow count, sum]
+_counters = {}                                              # (metric name, labels) -> count
+
+_current = local()                                          # (per thread) `request_start` -> the start time of the current request, and `trace` -> the phase breakdown of the current request (only if it's being profiled)
+
+_profiler = None                                            # the profiler's settings and the slowest requests so far (only when it's enabled)
+
+
+#############################
+######### Recording #########
+#############################
+
+def _get_labels_key(labels:dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def observe(name:str, seconds:float, **labels):
+    """Add a timing to a histogram metric."""
+    key = (name, _get_labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(_BUCKETS) + 1), 0.0]
+        histogram[0][bisect_left(_BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+def increment(name:str, amount:int=1, **labels):
+    """Add to a counter metric."""
+    key = (name, _get_labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+@contextmanager
+def span(phase:str):
+    """Time a phase of the library's work within a `with` block, adding it to the phase's
+    histogram (and to the breakdown of the current request, if it's being profiled)."""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        observe('edomode_phase_seconds', seconds, phase=phase)
+        trace = getattr(_current, 'trace', None)
+        if trace is not None:
+            trace['phases'][phase] = trace['phases'].get(phase, 0) + seconds
+
+def count_entries(stage:str, count:int):
+    """Count entries which were "scanned", "matched", or "returned" by a search."""
+    increment('edomode_entries_total', count, stage=stage)
+    trace = getattr(_current, 'trace', None)
+    if trace is not None:
+        trace['entries'][stage] = trace['entries'].get(stage, 0) + count
+
+def start_request():
+    """Start timing a request handled by the current thread (and profiling it, if the profiler
+    is enabled and the request is sampled)."""
+    _current.request_start = perf_counter()
+    profiler = _profiler
+    _current.trace = {'phases': {}, 'entries': {}} if profiler and random.random() < profiler['sample_rate'] else None
+
+def finish_request(endpoint:str, status:int):
+    """Finish timing the current thread's request (see `start_request()`)."""
+    start = getattr(_current, 'request_start', None)
+    if start is None:
+        return
+    seconds = perf_counter() - start
+    _current.request_start = None
+    observe('edomode_request_seconds', seconds, endpoint=endpoint)
+    increment('edomode_requests_total', endpoint=endpoint, status=str(status))
+    trace, _current.trace = getattr(_current, 'trace', None), None
+    profiler = _profiler
+    if trace is None or profiler is None:
+        return
+    record = dict({'endpoint': endpoint, 'status': status, 'seconds': seconds, 'time': time()}, **trace)
+    with _lock:
+        profiler['count'] += 1
+        item = (seconds, profiler['count'], record)         # (the count is only there so that records are never compared)
+        if len(profiler['slowest']) < profiler['n']:
+            heapq.heappush(profiler['slowest'], item)
+        else:
+            heapq.heappushpop(profiler['slowest'], item)    # (keep the slowest `n` requests - the fastest of them is always at the top of the heap)
+
+
+############################
+######### Profiler #########
+############################
+
+def enable_profiler(n:int=20, sample_rate:float=1.0):
+    """Start keeping the phase breakdowns of the `n` slowest requests (see `get_slowest_requests()`).
+    Only a `sample_rate` fraction of requests (chosen at random) are profiled, to keep its
+    overhead down when there are lots of requests."""
+    global _profiler
+    _profiler = {'n': n, 'sample_rate': sample_rate, 'count': 0, 'slowest': []}
+
+def get_slowest_requests() -> list[dict]:
+    """Get the slowest profiled requests (from slowest to fastest). Each is a dict with the
+    `endpoint`, response `status`, total `seconds`, `time` it finished (a timestamp), the
+    seconds spent in each of the library's `phases`, and the number of `entries` at each stage
+    of any searches. This is empty if the profiler isn't enabled."""
+    profiler = _profiler
+    if profiler is None:
+        return []
+    with _lock:
+        return [record for _, _, record in sorted(profiler['slowest'], reverse=True)]
+
+def format_slowest_requests() -> str:
+    """Get a readable report of the slowest profiled requests."""
+    lines = []
+    for record in get_slowest_requests():
+        lines.append(f"{record['seconds'] * 1000:10.2f} ms  {record['endpoint']} ({record['status']})")
+        for phase, seconds in sorted(record['phases'].items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"{seconds * 1000:22.2f} ms  {phase}")
+        if record['entries']:
+            lines.append(" " * 16 + ", ".join(f"{count} {stage}" for stage, count in record['entries'].items()) + " entries")
+    return "\n".join(lines)
+
+
+##########################
+######### Export #########
+##########################
+
+def _format_labels(labels:tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+def render() -> str:
+    """Get all metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: (counts.copy(), total) for key, (counts, total) in _histograms.items()}
+        counters = _counters.copy()
+    lines = []
+    for name, (metric_type, help_text) in _METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "counter":
+            for (metric_name, labels), count in sorted(counters.items()):
+                if metric_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {count}")
+            continue
+        for (metric_name, labels), (counts, total) in sorted(histograms.items()):
+            if metric_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(_BUCKETS + (float('inf'),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from threading import Condition, get_ident, local
+
+class RWLock:
+    """A reader/writer lock - any number of threads can hold it for reading at the same time,
+    but only one thread can hold it for writing (and no thread can read while it does).
+
+    Both modes are reentrant, and a thread which holds the lock for writing can also acquire
+    it for reading (nested acquires by a thread which already holds the lock never wait). But
+    a thread which only holds it for reading can't upgrade to writing, as two readers trying
+    to upgrade at the same time would wait on each other forever - this raises `RuntimeError`.
+
+    Waiting writers take priority over new readers, so that a steady stream of reads can never
+    stop a write from happening."""
+
+    def __init__(self):
+        self._cond = Condition()
+        self._readers = 0                                   # the number of threads currently holding the lock for reading
+        self._writer = None                                 # the id of the thread currently holding the lock for writing (if any)
+        self._writers_waiting = 0
+        self._held = local()                                # (per thread) `depth` -> how many times the thread has acquired the lock, and `mode` -> "read" or "write" for its first acquire
+
+    def acquire_read(self):
+        held = self._held
+        if getattr(held, 'depth', 0):
+            held.depth += 1                                 # the thread already holds the lock (for reading or writing), so it can always read
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        held.depth, held.mode = 1, "read"
+
+    def acquire_write(self):
+        held = self._held
+        if getattr(held, 'depth', 0):
+            if held.mode != "write":
+                raise RuntimeError("Cannot acquire the lock for writing while only holding it for reading.")
+            held.depth += 1
+            return
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = get_ident()
+        held.depth, held.mode = 1, "write"
+
+    def release(self):
+        """Release the lock once (for whichever mode it was last acquired in)."""
+        held = self._held
+        held.depth -= 1
+        if held.depth:
+            return
+        with self._cond:
+            if held.mode == "write":
+                self._writer = None
+            else:
+                self._readers -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        """Hold the lock for reading within a `with` block."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock for writing within a `with` block."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release()
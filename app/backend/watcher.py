@@ -0,0 +1,264 @@
+from pathlib import Path
+from threading import Event, Thread
+from time import monotonic, sleep
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+
+########################
+######### Data #########
+########################
+
+# The inotify event flags which are used (from <sys/inotify.h>):
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+# The logger for errors raised by watcher callbacks (which run in the watcher's thread, so can't be raised to anything else):
+_logger = logging.getLogger(__name__)
+
+# The events to watch the directory for:
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+
+# The header of each inotify event (the watch descriptor, event mask, cookie, and the length of the file name after it):
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+#################################
+######### Watch Backends ########
+#################################
+
+class _InotifyBackend:
+    """Gets the names of changed files in a directory (and some of its sub-directories) from the
+    Linux kernel's inotify API (through `ctypes`, so no extra packages are needed)."""
+
+    def __init__(self, dir_path:Path, subdirs:tuple[str]=()):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dir_path = dir_path
+        self.subdirs = set(subdirs)
+        self.prefixes = {}                                  # watch descriptor -> the prefix for the names of the files in its directory ("" for the directory itself, or the sub-directory name and a "/")
+        try:
+            self.root_wd = self._add_watch(dir_path, "")
+            for subdir in subdirs:
+                try:
+                    self._add_watch(dir_path / subdir, subdir + "/")
+                except FileNotFoundError:
+                    continue                                # (it will be watched once it's created)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_watch(self, path:Path, prefix:str) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")  # (this is a `FileNotFoundError` if the directory doesn't exist)
+        self.prefixes[wd] = prefix
+        return wd
+
+    def read(self, timeout:float) -> tuple[set[str], bool, bool]:
+        """Wait up to `timeout` seconds for events, and return the names of all files which
+        changed (relative to the directory), whether any events were lost (so the whole directory
+        needs to be checked), and whether the directory itself was deleted or moved (so it can't
+        be watched anymore)."""
+        names, overflow, gone = set(), False, False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return names, overflow, gone
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflow, gone
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset+name_len].rstrip(b'\0'))
+            offset += name_len
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                if wd == self.root_wd:
+                    gone = True
+                elif self.prefixes.pop(wd, None) is not None:
+                    overflow = True                         # (a sub-directory was removed, so the files which were in it are gone too)
+            if wd == self.root_wd and name in self.subdirs:
+                overflow = True                             # (a sub-directory was added or removed, so check everything, and watch it if it was added)
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    try:
+                        self._add_watch(self.dir_path / name, name + "/")
+                    except OSError:
+                        pass
+            elif name and wd in self.prefixes:
+                names.add(self.prefixes[wd] + name)
+        return names, overflow, gone
+
+    def close(self):
+        os.close(self.fd)
+
+class _PollingBackend:
+    """Gets the names of changed files in a directory (and some of its sub-directories) by
+    scanning them at a regular interval, and comparing the modification time, size, and inode
+    of each file with the last scan."""
+
+    def __init__(self, dir_path:Path, interval:float, subdirs:tuple[str]=()):
+        self.dir_path = dir_path
+        self.subdirs = subdirs
+        self.interval = interval
+        self.signatures = self._scan()
+        self.next_scan = monotonic() + interval
+
+    def _scan(self) -> dict:
+        signatures = {}
+        self._scan_dir(self.dir_path, "", signatures)
+        for subdir in self.subdirs:
+            try:
+                self._scan_dir(self.dir_path / subdir, subdir + "/", signatures)
+            except FileNotFoundError:
+                continue
+        return signatures
+
+    @staticmethod
+    def _scan_dir(dir_path:Path, prefix:str, signatures:dict):
+        with os.scandir(dir_path) as dir_entries:
+            for dir_entry in dir_entries:
+                try:
+                    stat = dir_entry.stat()
+                except FileNotFoundError:
+                    continue
+                signatures[prefix + dir_entry.name] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def read(self, timeout:float) -> tuple[set[str], bool, bool]:
+        """Wait up to `timeout` seconds (or until the next scan is due), and return the names
+        of all files which changed since the last scan (along with False and False, as events
+        can't be lost, and a missing directory is found by the scan instead)."""
+        wait = min(timeout, self.next_scan - monotonic())
+        if wait > 0:
+            sleep(wait)
+            if monotonic() < self.next_scan:
+                return set(), False, False
+        self.next_scan = monotonic() + self.interval
+        try:
+            signatures = self._scan()
+        except FileNotFoundError:
+            return set(), False, True
+        names = {name for name in signatures.keys() | self.signatures.keys() if signatures.get(name) != self.signatures.get(name)}
+        self.signatures = signatures
+        return names, False, False
+
+    def close(self):
+        pass
+
+
+###########################
+######### Watcher #########
+###########################
+
+class DirectoryWatcher:
+    """Watches the files directly within a directory (and within any of the sub-directories in
+    `subdirs`, but no others) for changes made by anything, and calls a function with the names
+    of the files which changed (relative to the directory, such as "file.md" or "subdir/file.md").
+
+    Events are coalesced - once a file changes, the watcher waits until no more changes happen
+    for `coalesce_delay` seconds (but never longer than `max_delay` seconds in total), and then
+    calls `callback` once with the set of the names of all files which changed, along with a
+    bool which is True if some changes may have been missed (so the whole directory should be
+    checked). This way, a burst of events (such as an editor saving a file by writing it in
+    several steps, or a sync tool changing many files at once) is handled all at once.
+
+    On Linux, inotify is used, so changes are found as they happen. Otherwise (or if `polling`
+    is True), the directory is scanned every `poll_interval` seconds instead.
+
+    The callback is run in the watcher's thread. If it raises an error, then the error is logged
+    and the watcher keeps going (the next call will say that changes may have been missed). If
+    the directory is deleted or moved, then the watcher stops (`is_alive()` will return False)."""
+
+    def __init__(self, dir_path:str|Path, callback, suffix:str="", subdirs:tuple[str]=(), polling:bool=False, poll_interval:float=1.0, coalesce_delay:float=0.05, max_delay:float=1.0):
+        """`suffix` (optional) - only report the files whose name ends with this.
+        `subdirs` (optional) - the names of the sub-directories to watch as well (if any of them
+        are added or removed, then it's reported as possibly missed changes)."""
+        self.dir_path = Path(dir_path)
+        self.callback = callback
+        self.suffix = suffix
+        self.coalesce_delay = coalesce_delay
+        self.max_delay = max_delay
+        self.backend = None
+        if not polling and sys.platform.startswith('linux'):
+            try:
+                self.backend = _InotifyBackend(self.dir_path, subdirs)
+            except (OSError, AttributeError):               # (AttributeError if libc doesn't have the inotify functions)
+                self.backend = None
+        if self.backend is None:
+            self.backend = _PollingBackend(self.dir_path, poll_interval, subdirs)
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    @property
+    def method(self) -> str:
+        """The method used to watch the directory ("inotify" or "polling")."""
+        return "inotify" if isinstance(self.backend, _InotifyBackend) else "polling"
+
+    def start(self):
+        """Start watching in a background thread. (The watch itself starts as soon as the
+        watcher is created, so no changes made after that are missed.)"""
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching (any pending changes are not reported)."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self):
+        pending, missed = set(), False
+        first_time = last_time = None                       # (the times of the first and last changes since the callback was last called)
+        try:
+            while not self._stop.is_set():
+                # 1) Wait for changes (only until the pending changes should be reported, if there are any):
+                if first_time is None:
+                    timeout = 0.5                           # (wake up regularly, so that the watcher can be stopped)
+                else:
+                    timeout = max(0, min(last_time + self.coalesce_delay, first_time + self.max_delay) - monotonic())
+                names, overflow, gone = self.backend.read(timeout)
+                if gone:
+                    break
+                names = {name for name in names if name.endswith(self.suffix)}
+                if names or overflow:
+                    pending |= names
+                    missed |= overflow
+                    last_time = monotonic()
+                    if first_time is None:
+                        first_time = last_time
+                # 2) Report the pending changes once no more have happened for a while (or it's been too long):
+                if first_time is not None:
+                    now = monotonic()
+                    if now >= last_time + self.coalesce_delay or now >= first_time + self.max_delay:
+                        try:
+                            self.callback(pending, missed)
+                            missed = False
+                        except Exception:
+                            _logger.exception("Failed to handle the changes in %s", self.dir_path)
+                            missed = True                   # (the changes may not all have been handled)
+                        pending = set()
+                        first_time = last_time = None
+        finally:
+            self.backend.close()
@@ -198,12 +198,8 @@ const defaultCommands = {
             const data = {'patterns': {'title': query, 'tags':query, 'content': query}};
                 // the request data should contain a single "patterns" object, with property names and search patterns for them
                 // in this case, the query is applied to all main string based properties: title, tags, content
-            const response = await MAIN.serverRequest("/lib/search", data);     // make request to server, sending the data (the returned response should be an object with each of the entries)
             MAIN.displayLogMessage("", `Results for Search Query: "${query}"`); // first create a message to denote the start of the search results
-            for (const entry of response) {                 // iterate through response, getting each entry
-                entry.time = MAIN.timestampToStr(entry.time);   // adjust the entry object's 'time' property to be a readable string before displaying
-                MAIN.logView.addEntry(entry, "pastEntry");  // render the entry in the log-view, displayed as separate from regular entries
-            }
+            await MAIN.displaySearchResults(data.patterns); // then get and display the first page of results
         } 
     },
 
@@ -230,14 +226,29 @@ const defaultCommands = {
             if (!Object.keys(data.patterns).length > 0) {
                 return                                      // if no patterns were given at all, then return now
             }
-            const response = await MAIN.serverRequest("/lib/search", data);     // make request to server, sending the data (the returned response should be an object with each of the entries)
-            for (const entry of response) {                 // iterate through response, getting each entry
-                entry.time = MAIN.timestampToStr(entry.time);   // adjust the entry object's 'time' property to be a readable string before displaying
-                MAIN.logView.addEntry(entry, "pastEntry");  // render the entry in the log-view, displayed as separate from regular entries
-            }
+            await MAIN.displaySearchResults(data.patterns); // get and display the first page of results
         } 
     },
 
+    more: {
+        desc: "Display the next page of results from the last search.",
+        async action() {
+            await MAIN.displayMoreSearchResults();
+        }
+    },
+
+    titles: {
+        desc: "Display the titles of entries which start with some text (ignoring case), optionally allowing a few typos.",
+        inputParams: [
+            ['prefix', "STR"],                              // the text that the titles start with
+            ['typos', [0, 1, 2], 0]                         // (optional) the number of typos in the prefix to allow
+        ],
+        async action(prefix, typos=0) {
+            const titles = await MAIN.getTitleCompletions(prefix, typos);
+            MAIN.displayLogMessage(titles.length ? titles.join("\n") : "No matching titles.", `Titles Starting With "${prefix}"`);
+        }
+    },
+
     note: {
         desc: "Create a new note entry.",
         inputParams: [
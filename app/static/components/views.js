@@ -67,8 +67,10 @@ customElements.define("log-view", class LogView extends CustomElementBase {
      * 
      * @param {Object} properties - an object containing a key/value for all properties that the entry should remember and display.
      * @param {string} styleType - the type of styling that should be used for this entry.
+     * @param {Element} before - (optional) an existing entry element to insert the new entry before, rather than appending it.
+     * @returns {Element} the new entry element.
      */
-    addEntry(properties, styleType="note") {
+    addEntry(properties, styleType="note", before=null) {
         // 1) Ensure that `properties` has all needed properties for entry display:
         const baseProps = ["time", "content"];  // "title",
         for (const prop of baseProps) { 
@@ -78,7 +80,8 @@ customElements.define("log-view", class LogView extends CustomElementBase {
         }
         // 2) Create the new log entry element and add it within this one (log-view):
         const entry = document.createElement("log-entry");
-        this.shadowRoot.appendChild(entry);
+        entry.styleType = styleType;                        // (remember the style type, so that the entry can be replaced with the same style)
+        this.shadowRoot.insertBefore(entry, before);        // (if `before` is null, then this appends the entry)
         // 3) Set the properties of the entry: (this should be done AFTER entry is added!)
         for (let [name, val] of Object.entries(properties)) {
             if (Array.isArray(val)) {
@@ -91,8 +94,48 @@ customElements.define("log-view", class LogView extends CustomElementBase {
             const styleSheet = CSSToStyleSheet(this.constructor.styleTypeCSS[styleType]);   // create a new stylesheet from the matching CSS code
             entry.shadowRoot.adoptedStyleSheets.push(styleSheet);           // add the new stylesheet to the element, so that the new styles take effect
         }
-        // 5) Finally, scroll to bottom of this view so that the entry element is visible:
-        this.scroll({left: 0, top: this.scrollHeight, behavior: "smooth"});
+        // 5) Finally, scroll to bottom of this view so that the entry element is visible (unless it was inserted somewhere else):
+        if (!before) {
+            this.scroll({left: 0, top: this.scrollHeight, behavior: "smooth"});
+        }
+        return entry;
+    }
+
+    /**
+     * Get all entry elements in this log view with a title.
+     * 
+     * @param {string} title - the title of the entries to get.
+     * @returns {Element[]} the entry elements.
+     */
+    findEntries(title) {
+        return [...this.shadowRoot.querySelectorAll("log-entry")].filter(entry => entry.getAttribute("title") === title);
+    }
+
+    /**
+     * Replace all entry elements in this log view with a title (if there are any) with new 
+     * ones, keeping their positions and style types.
+     * 
+     * @param {Object} properties - an object containing a key/value for all properties that the entries should remember and display (including the title).
+     * @returns {number} the number of entries which were replaced.
+     */
+    replaceEntries(properties) {
+        const entries = this.findEntries(properties.title);
+        for (const entry of entries) {
+            this.addEntry(properties, entry.styleType, entry);
+            entry.delete();
+        }
+        return entries.length;
+    }
+
+    /**
+     * Remove all entry elements in this log view with a title.
+     * 
+     * @param {string} title - the title of the entries to remove.
+     */
+    removeEntries(title) {
+        for (const entry of this.findEntries(title)) {
+            entry.delete();
+        }
     }
 
     /** Remove all entries (reset). */
@@ -15,6 +15,15 @@ const serverURL = window.location.origin;                   // gets the url orig
 
 const com = new CommandManager(defaultCommands);            // Create new `CommandManager` object, passing in the command object 
 
+const responseCache = new Map();                            // the most recent server responses which had an ETag -> request key (endpoint and body) -> {etag, data}
+const responseCacheSize = 50;                               // the maximum number of responses kept in `responseCache`
+
+const searchPageSize = 50;                                  // the number of search results displayed at a time
+const searchFields = ['title', 'time', 'type', 'tags', 'snippet'];  // the entry properties gotten for search results (the full content is only gotten when needed)
+let nextSearchPage = null;                                  // the patterns and cursor of the next page of results from the last search (if there is one)
+
+const titleCompletionCount = 10;                            // the number of titles gotten when completing a title
+
 
 /////////////////////////////////////////////////////////////////////////////////
 // Functions
@@ -58,6 +67,10 @@ function strToTimestamp(readableStr) {
  * This will NOT catch any errors from this process, and is expected to 
  * be used in an external context where errors will be be handled.
  * 
+ * If the server returned an ETag for the same request before, then it's 
+ * sent back with the request, and if the server responds that nothing 
+ * has changed (304), then the previous response data is returned again.
+ * 
  * @param {string} endPoint - the relative path of the server endpoint to make the request at.
  * @param {Object} data - an object containing the data for the POST request body.
  * @returns 
@@ -66,22 +79,67 @@ async function serverRequest(endPoint, data={}) {
     if (data.constructor !== Object) {
         throw new TypeError("The 'data' argument must be an Object");
     }
+    const body = JSON.stringify(data);                      // `JSON.stringify` converts object into JSON string
+    const cacheKey = endPoint + body;
+    const cached = responseCache.get(cacheKey);
     // Make the server request:
+    const headers = {
+        "Content-Type": "application/json"                  // lets server know that this is JSON
+    };
+    if (cached) {
+        headers["If-None-Match"] = cached.etag;             // lets server know which version of the response data we already have
+    }
     const response = await fetch(serverURL + endPoint, {
         method: "POST",                                     // makes a POST method (rather than GET)
         mode: "cors",
-        headers: {
-            "Content-Type": "application/json"              // lets server know that this is JSON
-        },
-        body: JSON.stringify(data)                          // `JSON.stringify` converts object into JSON string
+        headers: headers,
+        body: body
     });
+    // If the response data hasn't changed, then reuse the previous data:
+    if (response.status === 304 && cached) {
+        responseCache.delete(cacheKey);                     // (re-add the response, so that it's now the most recent one)
+        responseCache.set(cacheKey, cached);
+        return cached.data;
+    }
     // Handle any errors returned by the server:
     if (!response.ok) {
         const serverError = new Error(`${response.status} - ${response.statusText}\n${response.url}`);  // create a new error object, and set its message
         serverError.name = "Server Error";                  // set the name for the error
         throw serverError;                                  // throw the error
     }
-    return await response.json();                           // parse response body as JSON, and return it (this will become an object)
+    const responseData = await response.json();             // parse response body as JSON (this will become an object)
+    // Keep the response data if it has an ETag, removing the oldest response if there are too many:
+    const etag = response.headers.get("ETag");
+    if (etag) {
+        responseCache.delete(cacheKey);
+        responseCache.set(cacheKey, {etag: etag, data: responseData});
+        if (responseCache.size > responseCacheSize) {
+            responseCache.delete(responseCache.keys().next().value);
+        }
+    } else {
+        responseCache.delete(cacheKey);                     // (any previous response data for this request is out of date)
+    }
+    return responseData;
+}
+
+/**
+ * Get the titles of entries which start with some text (ignoring case), such as to complete
+ * a title as it's being typed. This only uses the server's title index, so it's fast enough
+ * to call on every key press.
+ *
+ * @param {string} prefix - the text that the titles start with.
+ * @param {number} typos - (optional) the number of typos in the prefix to allow (at most 2), in which case the closest titles are first.
+ * @returns {Promise<string[]>} the titles.
+ */
+async function getTitleCompletions(prefix, typos=0) {
+    const params = new URLSearchParams({'prefix': prefix, 'limit': titleCompletionCount, 'typos': typos});
+    const response = await fetch(serverURL + "/lib/titles?" + params);
+    if (!response.ok) {
+        const serverError = new Error(`${response.status} - ${response.statusText}\n${response.url}`);
+        serverError.name = "Server Error";
+        throw serverError;
+    }
+    return await response.json();
 }
 
 ///////// UI Display /////////
@@ -133,7 +191,98 @@ async function createEntry(props) {
         // -> this must be complete and without errors before continuing
     // 3) Display the entry in the log-view:    
     props['time'] = timestampToStr(props['time']);          // convert time property to string representation before displaying
-    logView.addEntry(props, "note");                        // display the new entry in log-view
+    if (!logView.replaceEntries(props)) {                   // (the change feed may have already displayed the entry)
+        logView.addEntry(props, "note");                    // display the new entry in log-view
+    }
+}
+
+///////// Search Results /////////
+
+/**
+ * Search for entries in the library, and display one page of the results in the log view.
+ * Only a snippet of each entry's content is gotten at first - clicking an entry gets and
+ * displays its full content. If there are more results, then they can be displayed with
+ * `displayMoreSearchResults()`.
+ *
+ * @param {Object} patterns - an object with property names and search patterns for them.
+ * @param {string} cursor - (optional) the cursor of the page of results to display (if not provided, then the first page is displayed).
+ */
+async function displaySearchResults(patterns, cursor=null) {
+    const data = {'patterns': patterns, 'fields': searchFields, 'limit': searchPageSize};
+    if (cursor) {
+        data['cursor'] = cursor;
+    }
+    const response = await serverRequest("/lib/search", data);  // (the response should have the `entries`, and the `cursor` of the next page)
+    for (const entry of response.entries) {
+        entry.time = timestampToStr(entry.time);            // adjust the entry object's 'time' property to be a readable string before displaying
+        entry.content = entry.snippet;                      // (display the snippet until the full content is needed)
+        delete entry.snippet;
+        const entryElement = logView.addEntry(entry, "pastEntry");  // render the entry in the log-view, displayed as separate from regular entries
+        entryElement.addEventListener("click", () => displayFullEntry(entry.title).catch(displayError), {once: true});
+    }
+    nextSearchPage = response.cursor ? {'patterns': patterns, 'cursor': response.cursor} : null;
+    if (nextSearchPage) {
+        displayLogMessage(`Use the "more" command to display the next ${searchPageSize} results.`, "More Results");
+    }
+}
+
+/** Display the next page of results from the last search (see `displaySearchResults()`). */
+async function displayMoreSearchResults() {
+    if (!nextSearchPage) {
+        throw new Error("There are no more search results to display");
+    }
+    await displaySearchResults(nextSearchPage.patterns, nextSearchPage.cursor);
+}
+
+/**
+ * Get an entry with its full content from the server, and re-render all displayed entries
+ * with its title.
+ *
+ * @param {string} title - the title of the entry.
+ */
+async function displayFullEntry(title) {
+    const entry = await serverRequest("/lib/entry", {'title': title});
+    entry.time = timestampToStr(entry.time);
+    logView.replaceEntries(entry);
+}
+
+///////// Library Change Feed /////////
+
+/**
+ * Apply the changes to library entries from the change feed to the log view: deleted 
+ * entries are removed, changed entries are re-rendered in place, and newly created 
+ * entries are added. If the changes aren't known (`changes` is null), then the recent 
+ * entries are displayed again instead.
+ * 
+ * @param {Object} data - the change data from the server, with a `changes` array (or null).
+ */
+function applyLibraryChanges(data) {
+    if (data.changes === null) {
+        executeCommandFromInput('/recent');
+        return;
+    }
+    for (const change of data.changes) {
+        if (change.action === "deleted") {
+            logView.removeEntries(change.title);
+            continue;
+        }
+        const entry = change.entry;
+        entry.time = timestampToStr(entry.time);            // adjust the entry object's 'time' property to be a readable string before displaying
+        if (!logView.replaceEntries(entry) && change.action === "created") {
+            logView.addEntry(entry, "note");                // only display entries which are new (any other changed entries are only updated if they're already displayed)
+        }
+    }
+}
+
+/**
+ * Start listening to the server's stream of library changes (server-sent events), so that 
+ * changes made by other clients, or to the library files outside of the app, are shown in 
+ * the log view as they happen. (The browser automatically reconnects if the stream is 
+ * interrupted, continuing from the last change it received.)
+ */
+function startChangeFeed() {
+    const changeStream = new EventSource(serverURL + "/lib/changes/stream");
+    changeStream.onmessage = (event) => applyLibraryChanges(JSON.parse(event.data));
 }
 
 ///////// Command /////////
@@ -182,6 +331,7 @@ async function executeCommandFromInput(inputStr) {
 
 window.onload = () => {
     executeCommandFromInput('/recent')                      // render most recent existing entries (stored on server) in the log view
+    startChangeFeed();                                      // then keep the log view up to date with any changes to the library
     commandBar.action = executeCommandFromInput;            // set `executeCommandFromInput` as the callback function for the command bar input event
 };
 
@@ -190,4 +340,4 @@ window.onload = () => {
 
 ///////// Exports (used by `commands` module) /////////
 
-export {logView, timestampToStr, serverRequest, createEntry, displayLogMessage}
\ No newline at end of file
+export {logView, timestampToStr, serverRequest, getTitleCompletions, createEntry, displayLogMessage, displaySearchResults, displayMoreSearchResults}
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""Check that the library watcher keeps the entry cache in sync with changes made to entry files
+outside of the app, and compare how long a search takes with and without the watcher.
+
+Each scenario simulates an outside edit (create, modify, rename, delete, an editor's atomic save,
+and a burst of many edits), and then waits until every entry in the cache matches what's in the
+files (checked by parsing them all again with `frontmatter`). This is done with both inotify
+(on Linux) and polling, and with both the flat and sharded library layouts.
+
+Usage: `python benchmarks/external_edits.py [entry count]` (defaults to 2000)
+"""
+
+from itertools import chain
+from pathlib import Path
+from sys import argv, path
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+import os
+import frontmatter
+
+path.insert(0, str(Path(__file__).parent.parent / "app"))  # make the app's `backend` package importable
+from backend import library as usr_lib
+
+SYNC_TIMEOUT = 5                                            # the number of seconds to wait for the cache to be in sync after each edit
+POLL_INTERVAL = 0.2                                         # the polling interval used when testing the polling watcher
+
+
+def write_entry(lib_dir:str, title:str, content:str, **props):
+    """Write an entry file directly (as another program would)."""
+    usr_lib._get_entry_filepath(lib_dir, title).write_text(frontmatter.dumps(frontmatter.Post(content, **props)), encoding='utf-8')
+
+def read_library(lib_dir:str) -> dict:
+    """Parse every entry file in a library, to get what the cache should contain."""
+    entries = {}
+    for file_path in chain(Path(lib_dir).glob("*.md"), Path(lib_dir).glob("*/*.md")):  # (entry files in either layout)
+        post = frontmatter.load(file_path)
+        title = usr_lib._get_entry_title_from_filepath(file_path)
+        entries[title] = dict({'title': title, 'content': post.content}, **post.metadata)
+    return entries
+
+def get_cached_library(lib_dir:str) -> dict:
+    """Get every entry in a library's entry cache (without scanning the library, when it's watched)."""
+    return {entry['title']: entry for entry in usr_lib.get_entries_by_patterns(lib_dir)}
+
+def wait_for_sync(lib_dir:str, start:float) -> float|None:
+    """Wait until the entry cache matches the entry files, and return how long it took since
+    `start` (in seconds), or None if it didn't within `SYNC_TIMEOUT` seconds."""
+    expected = read_library(lib_dir)
+    while perf_counter() - start < SYNC_TIMEOUT:
+        if get_cached_library(lib_dir) == expected:
+            return perf_counter() - start
+        sleep(0.01)
+    return None
+
+
+### Scenarios ###
+
+def create(lib_dir:str):
+    write_entry(lib_dir, "Outside note", "Created by another editor", time=1, type="note")
+
+def modify(lib_dir:str):
+    write_entry(lib_dir, "Note 1", "Changed by another editor", time=2, type="note", tags=["edited"])
+
+def rename(lib_dir:str):
+    os.rename(usr_lib._get_entry_filepath(lib_dir, "Note 2"), usr_lib._get_entry_filepath(lib_dir, "Nöte 2 (renamed): ü"))
+
+def delete(lib_dir:str):
+    usr_lib._get_entry_filepath(lib_dir, "Note 3").unlink()
+
+def atomic_save(lib_dir:str):
+    """Save a file the way many editors do - write a temporary file, then rename it over the original."""
+    file_path = usr_lib._get_entry_filepath(lib_dir, "Note 4")
+    temp_path = file_path.with_name(".Note 4.md.swp")
+    temp_path.write_text(frontmatter.dumps(frontmatter.Post("Saved atomically", time=4, type="note")), encoding='utf-8')
+    os.replace(temp_path, file_path)
+
+def burst(lib_dir:str):
+    """Change many files at once (like a sync tool would)."""
+    for i in range(10, 310):
+        write_entry(lib_dir, f"Note {i}", f"Synced change {i}", time=i, type="note")
+    for i in range(310, 330):
+        usr_lib._get_entry_filepath(lib_dir, f"Note {i}").unlink()
+
+SCENARIOS = [create, modify, rename, delete, atomic_save, burst]
+
+
+def time_search(lib_dir:str) -> float:
+    """Get the time (in milliseconds) of the fastest of 5 (different) searches."""
+    best = float('inf')
+    for i in range(5):
+        start = perf_counter()
+        usr_lib.get_entries_by_patterns(lib_dir, {'content': f"*note {i}"}, [('time', 'DSC')], 50)
+        best = min(best, perf_counter() - start)
+    return best * 1000
+
+def run(count:int, polling:bool, layout:str) -> bool:
+    passed = True
+    with TemporaryDirectory() as lib_dir:
+        usr_lib.validate_library(lib_dir)
+        usr_lib.migrate_library_layout(lib_dir, layout)
+        usr_lib.apply_batch(lib_dir, [{'op': 'create', 'entry': {'title': f"Note {i}", 'time': i, 'type': "note", 'content': f"note number {i}"}} for i in range(count)])
+        usr_lib.enable_text_index(lib_dir)
+        scan_ms = time_search(lib_dir)
+        method = usr_lib.watch_library(lib_dir, polling=polling, poll_interval=POLL_INTERVAL)
+        watched_ms = time_search(lib_dir)
+        print(f"\n{method}, {layout} layout: search with {count} entries -> {scan_ms:.2f} ms when scanning, {watched_ms:.2f} ms when watched")
+        for scenario in SCENARIOS:
+            start = perf_counter()
+            scenario(lib_dir)
+            seconds = wait_for_sync(lib_dir, start)
+            passed &= seconds is not None
+            print(f"  {scenario.__name__:<12} " + (f"in sync {seconds * 1000:.0f} ms after the edit started (including the check)" if seconds is not None else "NOT IN SYNC"))
+        usr_lib.stop_watching_library(lib_dir)
+    return passed
+
+def main(count:int):
+    results = [run(count, polling, layout) for layout in ("flat", "sharded") for polling in (False, True)]
+    print("\nAll scenarios passed." if all(results) else "\nSome scenarios FAILED.")
+
+
+if __name__ == "__main__":
+    main(int(argv[1]) if len(argv) > 1 else 2000)
@@ -0,0 +1,162 @@
+"""Load test the app server with mixed read/write traffic, and report the requests per second
+and latency percentiles for each endpoint.
+
+By default, this creates a temporary synthetic library, starts the app on it in production
+mode (`app.py --serve`), and sends requests to it from many client threads at once (searches,
+recent entry requests, and new entries). Use `--url` to test an app which is already running
+instead (note that this will create new entries in its library).
+
+Usage: `python benchmarks/load_test.py [--entries N] [--clients N] [--seconds N] [--url URL]`
+"""
+
+from argparse import ArgumentParser
+from http.client import HTTPConnection
+from pathlib import Path
+from sys import path, executable
+from tempfile import TemporaryDirectory, TemporaryFile
+from threading import Thread
+from time import perf_counter, sleep, time_ns
+from urllib.parse import urlsplit
+import importlib.util
+import json
+import random
+import socket
+import subprocess
+
+APP_DIR = Path(__file__).parent.parent / "app"
+path.insert(0, str(APP_DIR))                                # make the app's `backend` package importable
+from backend import library as usr_lib
+
+# The words used for the content of synthetic entries, and for search patterns:
+WORDS = ["apple", "bagel", "cloud", "delta", "ember", "fjord", "grape", "harbor", "island", "jungle", "kettle", "lemon"]
+
+# The (endpoint, weight) of each kind of request in the mixed traffic:
+TRAFFIC = [("/lib/search", 70), ("/lib/recent", 20), ("/lib/new", 10)]
+
+
+def make_library(lib_dir:str, count:int):
+    """Fill an empty library with `count` synthetic entries."""
+    usr_lib.validate_library(lib_dir)
+    rng = random.Random(count)
+    ops = [{'op': 'create', 'entry': {
+        'title': f"Note {i}", 'time': 1_700_000_000 + i, 'type': "note",
+        'content': " ".join(rng.choices(WORDS, k=40)), 'tags': rng.sample(WORDS, 2)
+    }} for i in range(count)]
+    usr_lib.apply_batch(lib_dir, ops)
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(host:str, port:int, timeout:float=60, server:subprocess.Popen=None):
+    """Wait until the server accepts connections (and has finished warming up the library). If 
+    the `server` process is provided and it exits first, then a `RuntimeError` is raised."""
+    start = perf_counter()
+    while perf_counter() - start < timeout:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"The server exited with code {server.returncode} before it started.")
+        try:
+            conn = HTTPConnection(host, port, timeout=timeout)
+            conn.request("POST", "/lib/recent", json.dumps({'n': 1}), {'Content-Type': "application/json"})
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        sleep(0.2)
+    raise TimeoutError(f"The server at {host}:{port} didn't start within {timeout} seconds.")
+
+def make_request_body(endpoint:str, rng:random.Random, client:int) -> dict:
+    if endpoint == "/lib/search":
+        return {'patterns': {'content': " ".join(rng.sample(WORDS, 2)), 'tags': rng.choice(WORDS)}}
+    if endpoint == "/lib/recent":
+        return {'n': 50}
+    return {'title': f"Load test {client} {time_ns()}", 'time': time_ns() // 10**9, 'type': "note",
+        'content': " ".join(rng.choices(WORDS, k=40))}
+
+def run_client(host:str, port:int, client:int, end_time:float, results:dict):
+    """Send requests until `end_time`, recording the latency (in seconds) of each, by endpoint."""
+    rng = random.Random(client)
+    endpoints, weights = zip(*TRAFFIC)
+    conn = HTTPConnection(host, port, timeout=60)           # (reconnects automatically if the server closes the connection)
+    while perf_counter() < end_time:
+        endpoint = rng.choices(endpoints, weights)[0]
+        body = json.dumps(make_request_body(endpoint, rng, client))
+        start = perf_counter()
+        try:
+            conn.request("POST", endpoint, body, {'Content-Type': "application/json"})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except OSError:
+            conn.close()
+            ok = False
+        latency = perf_counter() - start
+        results.setdefault(endpoint, []).append(latency)
+        if not ok:
+            results.setdefault('errors', []).append(endpoint)
+
+def get_percentile(sorted_values:list[float], percent:float) -> float:
+    return sorted_values[min(int(len(sorted_values) * percent / 100), len(sorted_values) - 1)]
+
+def report(all_results:list[dict], seconds:float):
+    print(f"{'endpoint':<14}{'requests':>10}{'req/s':>10}{'p50 (ms)':>11}{'p99 (ms)':>11}{'max (ms)':>11}")
+    rows = [endpoint for endpoint, _ in TRAFFIC] + ["(all)"]
+    for endpoint in rows:
+        latencies = sorted(latency for results in all_results for name, values in results.items()
+            if name != 'errors' and (endpoint == "(all)" or name == endpoint) for latency in values)
+        if not latencies:
+            continue
+        print(f"{endpoint:<14}{len(latencies):>10}{len(latencies) / seconds:>10.1f}"
+            f"{get_percentile(latencies, 50) * 1000:>11.1f}{get_percentile(latencies, 99) * 1000:>11.1f}{latencies[-1] * 1000:>11.1f}")
+    errors = sum(len(results.get('errors', [])) for results in all_results)
+    print(f"errors: {errors}")
+
+def run_load_test(host:str, port:int, clients:int, seconds:float):
+    all_results = [{} for _ in range(clients)]
+    end_time = perf_counter() + seconds
+    threads = [Thread(target=run_client, args=(host, port, i, end_time, all_results[i])) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(all_results, seconds)
+
+
+def main():
+    arg_parser = ArgumentParser(description="Load test the app server with mixed read/write traffic.")
+    arg_parser.add_argument('--entries', type=int, default=5000, help="the number of entries in the synthetic library")
+    arg_parser.add_argument('--clients', type=int, default=16, help="the number of clients sending requests at the same time")
+    arg_parser.add_argument('--seconds', type=float, default=10, help="how long to send requests for")
+    arg_parser.add_argument('--url', help="the URL of an app which is already running (if not provided, one is started)")
+    args = arg_parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        wait_for_server(url.hostname, url.port or 80)
+        run_load_test(url.hostname, url.port or 80, args.clients, args.seconds)
+        return
+    if importlib.util.find_spec("waitress") is None:
+        arg_parser.error("starting the app needs the waitress server, which isn't installed (install it with `pip install waitress`, or use `--url`)")
+    with TemporaryDirectory() as lib_dir, TemporaryFile() as server_errors:
+        print(f"Creating a library with {args.entries} entries...")
+        make_library(lib_dir, args.entries)
+        port = get_free_port()
+        server = subprocess.Popen([executable, "app.py", lib_dir, "--serve", "--port", str(port), "--block-during-warm-up"],
+            cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=server_errors)   # (the server's errors are kept, to show them if it fails to start)
+        try:
+            try:
+                wait_for_server("127.0.0.1", port, server=server)
+            except RuntimeError:
+                server_errors.seek(0)
+                print(server_errors.read().decode('utf-8', 'replace'))
+                raise
+            print(f"Sending requests from {args.clients} clients for {args.seconds} seconds...")
+            run_load_test("127.0.0.1", port, args.clients, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
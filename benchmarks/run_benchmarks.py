@@ -0,0 +1,260 @@
+"""Time the library module's hot paths on synthetic libraries, and save the results as JSON so
+that runs can be compared to find regressions.
+
+For each entry count, a synthetic library is generated in a temporary directory (see
+`synthetic_library.py`), and then these are timed:
+- startup - reading the whole library into a fresh entry cache with `warm_up_library()` (cold:
+every entry file is read - though the OS may still have them cached), then with a snapshot
+(warm), and the first search on a fresh cache without any warm up
+- searches - `get_entries_by_patterns()` with recent, single token, non-ASCII, quoted phrase,
+`*`/`!`, tag, and `#` range queries, by scanning entries, with the text index, and with the
+text index while the library is watched (like in the app), along with `get_recent_entries()`
+(each search's result cache is cleared before every run, and a repeated search which hits the
+result cache is timed separately)
+- titles - building the title index from the entry file names, and `complete_title()` with
+prefixes and typos
+- writes - `create_entry()`, `update_entry()`, and `apply_batch()` throughput
+
+Usage: `python benchmarks/run_benchmarks.py [--entries N ...] [--output FILE] [--compare FILE]`
+(see `--help` for all options)
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+from sys import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import os
+import platform
+import subprocess
+
+path.insert(0, str(Path(__file__).parent.parent / "app"))  # make the app's `backend` package importable
+from backend import library as usr_lib
+import synthetic_library
+
+SEARCH_SORT = [('MATCHSCORE', 'DSC'), ('time', 'DSC')]     # (the same sort as the app's search endpoint)
+
+# The (name, patterns, sort_props, n) of each search to time:
+SEARCHES = [
+    ("recent n=50", None, [('time', 'DSC')], 50),
+    ("all by title", None, [('title', 'ASC')], None),
+    ("single token", {'content': "harbor"}, SEARCH_SORT, None),
+    ("single token n=50", {'content': "harbor"}, SEARCH_SORT, 50),
+    ("non-ASCII token", {'title': "über"}, SEARCH_SORT, None),
+    ("quoted phrase", {'content': '"apple bagel"'}, SEARCH_SORT, None),
+    ("required/excluded", {'content': "*apple !bagel cloud"}, SEARCH_SORT, None),
+    ("tag", {'tags': "tag3"}, SEARCH_SORT, None),
+    ("number range", {'rating': "#3-5"}, SEARCH_SORT, None),
+    ("number comparison", {'rating': "#>8"}, SEARCH_SORT, 50),
+    ("general query", {'title': "river café", 'tags': "river café", 'content': "river café"}, SEARCH_SORT, None),
+]
+
+# The (name, prefix, max_typos) of each title completion to time:
+TITLE_COMPLETIONS = [
+    ("short prefix", "r", 0),
+    ("long prefix", "river c", 0),
+    ("non-ASCII prefix", "ÜBER", 0),
+    ("1 typo", "rivr", 1),
+    ("2 typos", "cafe bagl", 2),
+    ("no matches", "zzz", 1),
+]
+
+REGRESSION_THRESHOLD = 1.2                                  # (when comparing runs, a benchmark which takes this many times as long as before is a regression)
+
+
+def time_runs(func, repeat:int, before=None) -> dict:
+    """Run `func` `repeat` times (running `before` first each time, without timing it), and get
+    the median and minimum seconds that it took."""
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return {'seconds': median(times), 'min_seconds': min(times), 'runs': repeat}
+
+def reset_cache(lib_dir:str):
+    """Remove a library's entry cache, so that the next library call starts from nothing (as if
+    the app was just started)."""
+    usr_lib._entry_caches.pop(Path(lib_dir).resolve(), None)
+
+def clear_results(lib_dir:str):
+    usr_lib._get_entry_cache(lib_dir).results.clear()
+
+def bench_startup(lib_dir:str, repeat:int, workers:int|None) -> list[dict]:
+    results = []
+    first_search = SEARCHES[2]
+    def cold_warm_up():
+        usr_lib.warm_up_library(lib_dir, workers=workers, text_index=True)
+    def snapshot_warm_up():
+        usr_lib.warm_up_library(lib_dir, workers=workers, text_index=True, snapshot=True)
+    def search():
+        usr_lib.get_entries_by_patterns(lib_dir, *first_search[1:])
+    results.append(dict(name="startup/cold warm up", **time_runs(cold_warm_up, repeat, lambda: reset_cache(lib_dir))))
+    usr_lib.save_snapshot(lib_dir)
+    results.append(dict(name="startup/warm up from snapshot", **time_runs(snapshot_warm_up, repeat, lambda: reset_cache(lib_dir))))
+    results.append(dict(name=f"startup/first search ({first_search[0]})", **time_runs(search, repeat, lambda: reset_cache(lib_dir))))
+    return results
+
+def bench_searches(lib_dir:str, repeat:int, text_index:bool, watch:bool=False) -> list[dict]:
+    """Time each search in `SEARCHES`, with or without the text index. Unless the library is
+    watched (like it is in the app), every search first checks every entry file for changes."""
+    results = []
+    mode = ("indexed" if text_index else "scan") + (", watched" if watch else "")
+    reset_cache(lib_dir)
+    usr_lib.get_entries_by_patterns(lib_dir)                # (load every entry into the cache first)
+    if text_index:
+        usr_lib.enable_text_index(lib_dir)
+    if watch:
+        usr_lib.watch_library(lib_dir)
+    for name, patterns, sort_props, n in SEARCHES:
+        search = lambda: usr_lib.get_entries_by_patterns(lib_dir, patterns, sort_props, n)
+        matches = len(search())
+        results.append(dict(name=f"search/{mode}/{name}", matches=matches, **time_runs(search, repeat, lambda: clear_results(lib_dir))))
+    name, patterns, sort_props, n = SEARCHES[-1]
+    results.append(dict(name=f"search/{mode}/{name} (result cache hit)", **time_runs(lambda: usr_lib.get_entries_by_patterns(lib_dir, patterns, sort_props, n), repeat)))
+    if not text_index:
+        results.append(dict(name="search/get_recent_entries n=50", **time_runs(lambda: usr_lib.get_recent_entries(lib_dir, 50), repeat)))
+    if watch:
+        usr_lib.stop_watching_library(lib_dir)
+    return results
+
+def bench_titles(lib_dir:str, repeat:int) -> list[dict]:
+    """Time building the title index on a fresh cache, and then each title completion in
+    `TITLE_COMPLETIONS` while the library is watched (like in the app - otherwise every
+    completion first checks whether the library directory changed)."""
+    results = []
+    results.append(dict(name="titles/build index", **time_runs(lambda: usr_lib.complete_title(lib_dir, ""), repeat, lambda: reset_cache(lib_dir))))
+    usr_lib.watch_library(lib_dir)
+    usr_lib.get_entries_by_patterns(lib_dir)                # (scan the library once, so the watcher keeps the cache up to date from then on)
+    for name, prefix, max_typos in TITLE_COMPLETIONS:
+        complete = lambda: usr_lib.complete_title(lib_dir, prefix, 10, max_typos)
+        matches = len(complete())
+        results.append(dict(name=f"titles/{name}", matches=matches, **time_runs(complete, repeat)))
+    usr_lib.stop_watching_library(lib_dir)
+    return results
+
+def bench_writes(lib_dir:str, count:int, repeat:int, seed:int) -> list[dict]:
+    """Time creating and updating `count` new entries, one at a time and in a batch (the new
+    entries are deleted again after each run). Each result's `seconds` is for a single entry."""
+    results = []
+    def get_new_entries(run:int) -> list[dict]:
+        entries = list(synthetic_library.generate_entries(count, seed=seed + run + 1))
+        for entry in entries:
+            entry['title'] = f"New {run} {entry['title']}"  # (so that they don't have the same title as any existing entries)
+        return entries
+    def create(entries:list[dict]):
+        for entry in entries:
+            usr_lib.create_entry(lib_dir, dict(entry))     # (copied, as the library takes the title out of the entry data)
+    def batch_create(entries:list[dict]):
+        usr_lib.apply_batch(lib_dir, [{'op': 'create', 'entry': dict(entry)} for entry in entries])
+    def update(entries:list[dict]):
+        for entry in entries:
+            usr_lib.update_entry(lib_dir, entry['title'], {'content': entry['content'] + " updated"})
+    # The (name, setup, func) of each benchmark, where `setup` (if any) is run on the new entries first, without timing it:
+    cases = [("create_entry", None, create), ("apply_batch (create)", None, batch_create), ("update_entry", batch_create, update)]
+    for name, setup, func in cases:
+        times = []
+        for run in range(repeat):
+            entries = get_new_entries(run)
+            if setup:
+                setup(entries)
+            start = perf_counter()
+            func(entries)
+            times.append((perf_counter() - start) / count)
+            usr_lib.apply_batch(lib_dir, [{'op': 'delete', 'title': entry['title']} for entry in entries])
+        results.append({'name': f"write/{name}", 'seconds': median(times), 'min_seconds': min(times), 'runs': repeat, 'ops_per_second': 1 / median(times)})
+    return results
+
+def run_suite(count:int, args) -> list[dict]:
+    results = []
+    with TemporaryDirectory() as lib_dir:
+        print(f"\nGenerating a library with {count} entries...")
+        seconds = synthetic_library.make_library(lib_dir, count, **synthetic_library.get_library_kwargs(args))
+        results.append({'name': "generate library", 'seconds': seconds, 'runs': 1})
+        results += bench_startup(lib_dir, args.repeat, args.workers)
+        results += bench_searches(lib_dir, args.repeat, text_index=False)
+        results += bench_searches(lib_dir, args.repeat, text_index=True)
+        results += bench_searches(lib_dir, args.repeat, text_index=True, watch=True)
+        results += bench_titles(lib_dir, args.repeat)
+        results += bench_writes(lib_dir, args.writes, args.repeat, args.seed)
+        reset_cache(lib_dir)
+    for result in results:
+        result['entries'] = count
+        print_result(result)
+    return results
+
+
+### Output ###
+
+def format_seconds(seconds:float) -> str:
+    return f"{seconds:.2f} s" if seconds >= 1 else f"{seconds * 1000:.3f} ms"
+
+def print_result(result:dict):
+    extra = f"  ({result['matches']} matches)" if 'matches' in result else ""
+    if 'ops_per_second' in result:
+        extra = f"  ({result['ops_per_second']:.0f} entries/s)"
+    print(f"  {result['name']:<58}{format_seconds(result['seconds']):>12}{extra}")
+
+def get_commit() -> str|None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results:list[dict], baseline_path:str):
+    """Print how long each benchmark took compared to a previous run (saved with `--output`)."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(result['entries'], result['name']): result for result in json.load(f)['results']}
+    print(f"\nCompared to {baseline_path}:")
+    regressions = 0
+    for result in results:
+        old = baseline.get((result['entries'], result['name']))
+        if old is None or not old['seconds']:
+            continue
+        ratio = result['seconds'] / old['seconds']
+        is_regression = ratio >= REGRESSION_THRESHOLD
+        regressions += is_regression
+        print(f"  {result['entries']:>8} {result['name']:<58}{format_seconds(old['seconds']):>12} ->{format_seconds(result['seconds']):>12}  x{ratio:.2f}" + ("  SLOWER" if is_regression else ""))
+    print(f"{regressions} benchmark(s) took at least {REGRESSION_THRESHOLD}x as long as before.")
+
+
+def main():
+    arg_parser = ArgumentParser(description="Time the library module's hot paths on synthetic libraries.")
+    arg_parser.add_argument('--entries', type=int, nargs='+', default=[1000, 10000], help="the entry counts of the libraries to benchmark (e.g. 1000 100000 1000000)")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="the number of times to run each benchmark (the median time is reported)")
+    arg_parser.add_argument('--writes', type=int, default=200, help="the number of entries to create and update in the write benchmarks")
+    arg_parser.add_argument('--workers', type=int, help="the number of worker processes used to warm up the library (defaults to the number of CPUs)")
+    arg_parser.add_argument('--output', help="save the results to this JSON file")
+    arg_parser.add_argument('--compare', help="compare the results with a previous run's JSON file")
+    synthetic_library.add_library_args(arg_parser)
+    args = arg_parser.parse_args()
+
+    results = []
+    for count in args.entries:
+        results += run_suite(count, args)
+    if args.output:
+        report = {
+            'meta': {
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'commit': get_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'options': vars(args)
+            },
+            'results': results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, ensure_ascii=False)
+        print(f"\nSaved the results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare the old multi-pass sort used by `get_entries_by_patterns()` against the
+single-pass composite-key sorter (`library._sort_entries`), on synthetic in-memory entries.
+
+Usage: `python benchmarks/sort_benchmark.py [entry counts...]` (defaults to 10000 and 100000)
+"""
+
+from pathlib import Path
+from sys import argv, path
+from time import perf_counter
+import random
+
+path.insert(0, str(Path(__file__).parent.parent / "app"))  # make the app's `backend` package importable
+from backend import library as usr_lib
+
+# The old sort can't run "MATCHSCORE" sorts on more entries than this in a reasonable time (it's O(n^2)):
+OLD_MATCHSCORE_LIMIT = 20_000
+
+# The (name, sort_props, n) cases to time:
+CASES = [
+    ("recent n=50", [('time', 'DSC')], 50),
+    ("title ASC (all)", [('title', 'ASC')], None),
+    ("search (all)", [('MATCHSCORE', 'DSC'), ('time', 'DSC')], None),
+    ("search n=50", [('MATCHSCORE', 'DSC'), ('time', 'DSC')], 50),
+]
+
+
+def old_sort(matched_entries:list[dict], entry_match_scores:list[int], sort_props:list, n:int=None) -> list[dict]:
+    """The sort that `get_entries_by_patterns()` used before the composite-key sorter (copied as is)."""
+    sorted_matched_entries = matched_entries.copy()
+    for prop, order in reversed(sort_props):
+        def key_func(entry):
+            prop_type = usr_lib._BASE_PROPERTIES.get(prop)
+            if isinstance(prop_type, (tuple, list)):
+                prop_type = prop_type[type(0)]
+            default_vals_by_type = {
+                int: float('-inf') if order.upper() == "DSC" else float('inf'),
+                str: '' if order.upper() == "DSC" else ('z'*100)
+            }
+            def_val = default_vals_by_type.get(prop_type)
+            return entry.get(prop, def_val)
+        if prop == "MATCHSCORE":
+            key_func = lambda entry: entry_match_scores[matched_entries.index(entry)]
+        rev = True if order.upper() == 'DSC' else False
+        sorted_matched_entries.sort(key=key_func, reverse=rev)
+    if n:
+        return sorted_matched_entries[:n]
+    return sorted_matched_entries
+
+
+def make_entries(count:int) -> tuple[list[dict], list[int]]:
+    """Create `count` synthetic entries and match scores."""
+    rng = random.Random(count)
+    entries = [{'title': f"Note {i}", 'time': rng.randrange(10**12), 'type': "note", 'content': ""} for i in range(count)]
+    scores = [rng.randrange(1, 6) for _ in range(count)]
+    return entries, scores
+
+
+def time_call(func, *args) -> float:
+    """Get the time (in milliseconds) of the fastest of 3 calls of a function."""
+    best = float('inf')
+    for _ in range(3):
+        start = perf_counter()
+        func(*args)
+        best = min(best, perf_counter() - start)
+    return best * 1000
+
+
+def main(counts:list[int]):
+    print(f"{'entries':>8}  {'case':<18}{'old (ms)':>12}{'new (ms)':>12}{'speedup':>10}")
+    for count in counts:
+        entries, scores = make_entries(count)
+        for name, sort_props, n in CASES:
+            new_ms = time_call(usr_lib._sort_entries, entries, scores, sort_props, n)
+            if any(prop == "MATCHSCORE" for prop, _ in sort_props) and count > OLD_MATCHSCORE_LIMIT:
+                print(f"{count:>8}  {name:<18}{'(skipped)':>12}{new_ms:>12.2f}{'-':>10}")
+                continue
+            old_ms = time_call(old_sort, entries, scores, sort_props, n)
+            print(f"{count:>8}  {name:<18}{old_ms:>12.2f}{new_ms:>12.2f}{old_ms / new_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in argv[1:]] or [10_000, 100_000])
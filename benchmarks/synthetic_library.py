@@ -0,0 +1,126 @@
+"""Generate synthetic libraries for benchmarks, through the library module itself (so the entry
+files are exactly what the app would write).
+
+Entries get a mix of ASCII and non-ASCII words in their titles and content, so that the `%code%`
+file name encoding is exercised, along with tags (picked from a vocabulary with a uniform or a
+Zipf-like distribution), and a numeric `rating` property for `#` range queries.
+
+Usage: `python benchmarks/synthetic_library.py <library dir> <entry count> [options]`
+(see `--help` for the options)
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from sys import path
+from time import perf_counter
+import random
+
+path.insert(0, str(Path(__file__).parent.parent / "app"))  # make the app's `backend` package importable
+from backend import library as usr_lib
+
+# The words used for titles and content (the last ones are non-ASCII, to exercise the file name encoding):
+WORDS = ["apple", "bagel", "cloud", "delta", "ember", "fjord", "grape", "harbor", "island", "jungle",
+    "kettle", "lemon", "meadow", "nickel", "orbit", "pepper", "quartz", "river", "saddle", "timber",
+    "über", "café", "naïve", "smörgås", "jalapeño", "日本", "λόγος", "смысл"]
+
+# Characters which aren't allowed in file names, added to some titles (these are also `%code%` encoded):
+TITLE_SYMBOLS = [":", "?", "/", "*", "%", '"']
+
+START_TIME = 1_700_000_000                                  # the time of the first entry (each later entry is 1-120 seconds after the last)
+
+
+def get_tag_picker(rng:random.Random, tag_count:int, distribution:str):
+    """Get a function which picks a tag from a vocabulary of `tag_count` tags, either with
+    every tag equally likely ("uniform"), or with a few tags being much more common than
+    the rest ("zipf" - the nth most common tag is picked about 1/n as often as the first)."""
+    tags = [f"tag{i}" for i in range(tag_count)]
+    if distribution == "uniform":
+        return lambda: rng.choice(tags)
+    weights = [1 / (i + 1) for i in range(tag_count)]
+    return lambda: rng.choices(tags, weights)[0]
+
+def generate_entries(count:int, content_words:int=60, tag_count:int=50, tag_distribution:str="zipf", symbol_ratio:float=0.1, seed:int=0):
+    """Generate the entry data for `count` synthetic entries (as a generator).
+    - `content_words` - the average number of words in each entry's content (each has between
+    half and one and a half times as many).
+    - `tag_count` and `tag_distribution` - see `get_tag_picker()`. Each entry has 0-3 tags.
+    - `symbol_ratio` - the fraction of titles which include a character that isn't allowed in
+    file names.
+    """
+    rng = random.Random(seed)
+    pick_tag = get_tag_picker(rng, tag_count, tag_distribution)
+    time = START_TIME
+    for i in range(count):
+        time += rng.randint(1, 120)
+        title = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+        if rng.random() < symbol_ratio:
+            title = f"{rng.choice(TITLE_SYMBOLS)}{title}"
+        entry = {
+            'title': title,
+            'time': time,
+            'type': rng.choice(usr_lib._BASE_PROPERTIES['type']),
+            'content': " ".join(rng.choices(WORDS, k=rng.randint(content_words // 2, content_words * 3 // 2))),
+            'rating': rng.randint(0, 10)
+        }
+        tags = {pick_tag() for _ in range(rng.randint(0, 3))}
+        if tags:
+            entry['tags'] = sorted(tags)
+        yield entry
+
+def make_library(lib_dir:str, count:int, batch:bool=False, layout:str="flat", progress=None, **kwargs) -> float:
+    """Fill a library with `count` synthetic entries (see `generate_entries()` for the other
+    arguments), and return how many seconds it took. Each entry is created with `create_entry()`,
+    unless `batch` is True, in which case they're all created with `apply_batch()` (which is
+    much faster for large libraries). The library's entry files are in `layout` ("flat" or
+    "sharded"). `progress` (optional) is called with the number of entries created so far,
+    every 10000 entries."""
+    usr_lib.validate_library(lib_dir)
+    usr_lib.migrate_library_layout(lib_dir, layout)
+    start = perf_counter()
+    entries = generate_entries(count, **kwargs)
+    if batch:
+        ops = []
+        for i, entry in enumerate(entries, 1):
+            ops.append({'op': 'create', 'entry': entry})
+            if len(ops) == 10_000 or i == count:
+                for result in usr_lib.apply_batch(lib_dir, ops):
+                    assert result['ok'], result['error']
+                ops = []
+                if progress:
+                    progress(i)
+    else:
+        for i, entry in enumerate(entries, 1):
+            usr_lib.create_entry(lib_dir, entry)
+            if progress and (i % 10_000 == 0 or i == count):
+                progress(i)
+    return perf_counter() - start
+
+def add_library_args(arg_parser:ArgumentParser):
+    """Add the arguments for the synthetic library options to an argument parser."""
+    arg_parser.add_argument('--content-words', type=int, default=60, help="the average number of words in each entry's content")
+    arg_parser.add_argument('--tag-count', type=int, default=50, help="the number of different tags")
+    arg_parser.add_argument('--tag-distribution', choices=["zipf", "uniform"], default="zipf", help="how often each tag is used")
+    arg_parser.add_argument('--symbol-ratio', type=float, default=0.1, help="the fraction of titles with characters which aren't allowed in file names")
+    arg_parser.add_argument('--seed', type=int, default=0, help="the random seed (the same seed always generates the same library)")
+    arg_parser.add_argument('--batch', action='store_true', help="create the entries with `apply_batch()` instead of `create_entry()` (much faster for large libraries)")
+    arg_parser.add_argument('--layout', choices=["flat", "sharded"], default="flat", help="the layout of the library's entry files")
+
+def get_library_kwargs(args) -> dict:
+    """Get the `make_library()` keyword arguments from the parsed arguments of `add_library_args()`."""
+    return {'content_words': args.content_words, 'tag_count': args.tag_count, 'tag_distribution': args.tag_distribution,
+        'symbol_ratio': args.symbol_ratio, 'seed': args.seed, 'batch': args.batch, 'layout': args.layout}
+
+
+def main():
+    arg_parser = ArgumentParser(description="Generate a synthetic library.")
+    arg_parser.add_argument('lib_dir', help="the library directory (created if it doesn't exist, and should be empty)")
+    arg_parser.add_argument('count', type=int, help="the number of entries to create")
+    add_library_args(arg_parser)
+    args = arg_parser.parse_args()
+    Path(args.lib_dir).mkdir(parents=True, exist_ok=True)
+    seconds = make_library(args.lib_dir, args.count, progress=lambda done: print(f"Created {done}/{args.count} entries", end="\r"), **get_library_kwargs(args))
+    print(f"\nCreated {args.count} entries in {seconds:.1f} seconds.")
+
+
+if __name__ == "__main__":
+    main()